@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import random
+import timeit
+from tabulate import tabulate
+
+os.environ.setdefault("GUILDS", "0")
+os.environ.setdefault("OPERATOR_ID", "0")
+
+from main import CODECS, encode_snapshot, decode_snapshot  # noqa: E402
+
+
+def synthetic_database(num_users: int, num_weeks: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    names = [f"user{i:05d}" for i in range(num_users)]
+    weeks = {}
+    for week in range(1, num_weeks + 1):
+        options = rng.sample(names, k=min(8, num_users))
+        bets = {}
+        for name in rng.sample(names, k=num_users // 2):
+            bets[name] = {
+                option: rng.randint(1, 500)
+                for option in rng.sample(options, k=rng.randint(1, 4))
+            }
+        pool = {}
+        for user_bets in bets.values():
+            for option, value in user_bets.items():
+                pool[option] = pool.get(option, 0) + value
+        weeks[str(week)] = {
+            "options": options,
+            "result": {
+                ":tada: Winner": options[0],
+                ":moneybag: Total betting pool": sum(pool.values()),
+            },
+            "betting_pool": pool,
+            "bets": bets,
+            "claimed": {name: True for name in rng.sample(names, k=num_users // 3)},
+        }
+    return {
+        "users": {name: rng.randint(0, 100_000) for name in names},
+        "user_map": {name: rng.getrandbits(60) for name in names[:50]},
+        "weeks": weeks,
+    }
+
+
+def bench(data: dict, repeat: int):
+    rows = []
+
+    legacy = json.dumps(data, indent=4).encode("utf-8")
+    rows.append(
+        [
+            "legacy (indent=4)",
+            len(legacy),
+            timeit.timeit(lambda: json.dumps(data, indent=4), number=repeat) / repeat,
+            timeit.timeit(lambda: decode_snapshot(legacy), number=repeat) / repeat,
+        ]
+    )
+
+    for name, codec in CODECS.items():
+        snapshot = encode_snapshot(data, name)
+        assert decode_snapshot(snapshot) == data, f"{name} did not round trip"
+        label = name
+        if hasattr(codec, "backend"):
+            label = f"{name} ({codec.backend})"
+        rows.append(
+            [
+                label,
+                len(snapshot),
+                timeit.timeit(lambda: encode_snapshot(data, name), number=repeat)
+                / repeat,
+                timeit.timeit(lambda: decode_snapshot(snapshot), number=repeat)
+                / repeat,
+            ]
+        )
+
+    for row in rows:
+        row[2] = round(row[2] * 1000, 2)
+        row[3] = round(row[3] * 1000, 2)
+    return rows
+
+
+def main():
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    num_weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 104
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    data = synthetic_database(num_users, num_weeks)
+    print(f"{num_users} users, {num_weeks} weeks, average of {repeat} runs")
+    print(
+        tabulate(
+            bench(data, repeat),
+            headers=["codec", "bytes", "encode ms", "decode ms"],
+            tablefmt="outline",
+            numalign="right",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
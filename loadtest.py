@@ -0,0 +1,374 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from tabulate import tabulate
+
+os.environ.setdefault("GUILDS", "0")
+os.environ.setdefault("OPERATOR_ID", "0")
+
+import discord  # noqa: E402
+import main  # noqa: E402
+
+# Offline stand-ins for the parts of py-cord the cog and the giveaway button
+# touch. Every call that would be an HTTP request to Discord sleeps for the
+# simulated round trip instead.
+
+
+class FakeRole:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, roles=None):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.roles = roles if roles is not None else []
+
+
+class FakeMessage:
+    def __init__(self):
+        self.id = random.getrandbits(60)
+        self.created_at = datetime.now(timezone.utc)
+
+
+class FakeResponse:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.done = False
+        self.sent = []
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def defer(self, ephemeral: bool = False, **kwargs):
+        if self.done:
+            raise RuntimeError("Interaction already responded to")
+        await asyncio.sleep(self.rtt)
+        self.done = True
+
+    async def send_message(self, content=None, **kwargs):
+        if self.done:
+            raise RuntimeError("Interaction already responded to")
+        await asyncio.sleep(self.rtt)
+        self.done = True
+        self.sent.append((content, kwargs))
+
+
+class FakeFollowup:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self.rtt)
+        self.sent.append((content, kwargs))
+        return FakeMessage()
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser, rtt: float, message: FakeMessage = None):
+        self.id = discord.utils.time_snowflake(datetime.now(timezone.utc))
+        self.user = user
+        self.response = FakeResponse(rtt)
+        self.followup = FakeFollowup(rtt)
+        self.message = message
+
+
+class FakeApplicationContext:
+    def __init__(self, user: FakeUser, rtt: float):
+        self.user = user
+        self.author = user
+        self.interaction = FakeInteraction(user, rtt)
+        self.followup = self.interaction.followup
+
+    async def defer(self, ephemeral: bool = False, **kwargs):
+        await self.interaction.response.defer(ephemeral=ephemeral)
+
+    async def respond(self, *args, **kwargs):
+        # Same routing as discord.ApplicationContext.respond
+        if not self.interaction.response.is_done():
+            return await self.interaction.response.send_message(*args, **kwargs)
+        return await self.followup.send(*args, **kwargs)
+
+
+class FakeOption:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeAutocompleteContext:
+    def __init__(self, user: FakeUser, value: str, rtt: float):
+        self.value = value
+        self.options = {}
+        self.focused = FakeOption("user")
+        self.interaction = FakeInteraction(user, rtt)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}  # operation -> list of seconds
+        self.errors = {}  # operation -> count
+
+    async def timed(self, operation: str, coro):
+        start = time.perf_counter()
+        try:
+            await coro
+        except Exception:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+            return
+        self.latencies.setdefault(operation, []).append(time.perf_counter() - start)
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def monitor_loop_lag(samples: list, interval: float, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def simulated_user(
+    cog: main.Commands,
+    button: main.PointButton,
+    giveaway: FakeMessage,
+    user: FakeUser,
+    recorder: Recorder,
+    args,
+    deadline: float,
+):
+    rng = random.Random(user.id)
+    rtt = args.rtt_ms / 1000
+    options = cog.game.weeks[cog.current_week]["options"]
+    # Spread the first commands out instead of starting everyone at once
+    await asyncio.sleep(rng.uniform(0, args.think_ms / 1000))
+    while time.perf_counter() < deadline:
+        roll = rng.random()
+        if roll < 0.25:
+            ctx = FakeApplicationContext(user, rtt)
+            await recorder.timed(
+                "bet",
+                cog.bet.callback(
+                    cog, ctx, rng.choice(options), rng.randint(1, args.start_fluxbux // 10)
+                ),
+            )
+        elif roll < 0.35:
+            ctx = FakeApplicationContext(user, rtt)
+            await recorder.timed(
+                "remove_bet", cog.remove_bet.callback(cog, ctx, rng.choice(options))
+            )
+        elif roll < 0.55:
+            actx = FakeAutocompleteContext(user, rng.choice(options)[:1], rtt)
+            await recorder.timed("autocomplete", cog.bet_on_autocompleter(actx))
+        elif roll < 0.7:
+            ctx = FakeApplicationContext(user, rtt)
+            await recorder.timed("status", cog.status.callback(cog, ctx, None))
+        elif roll < 0.8:
+            ctx = FakeApplicationContext(user, rtt)
+            await recorder.timed("balance", cog.balance.callback(cog, ctx))
+        elif roll < 0.9:
+            ctx = FakeApplicationContext(user, rtt)
+            await recorder.timed(
+                "transfer",
+                cog.transfer.callback(
+                    cog, ctx, f"user{rng.randrange(args.users)}", rng.randint(1, 10)
+                ),
+            )
+        else:
+            interaction = FakeInteraction(user, rtt, message=giveaway)
+            await recorder.timed("giveaway", button.callback(interaction))
+        await asyncio.sleep(rng.expovariate(1 / (args.think_ms / 1000)))
+
+
+async def spammer(cog: main.Commands, user: FakeUser, recorder: Recorder, args, deadline):
+    # Scripts one command as fast as the replies come back
+    rtt = args.rtt_ms / 1000
+    rng = random.Random(user.id)
+    options = cog.game.weeks[cog.current_week]["options"]
+    while time.perf_counter() < deadline:
+        if args.spam == "bet":
+            ctx = FakeApplicationContext(user, rtt)
+            coro = cog.bet.callback(cog, ctx, rng.choice(options), 1)
+        elif args.spam == "autocomplete":
+            actx = FakeAutocompleteContext(user, rng.choice(options)[:1], rtt)
+            coro = cog.bet_on_autocompleter(actx)
+        else:
+            ctx = FakeApplicationContext(user, rtt)
+            coro = cog.status.callback(cog, ctx, None)
+        await recorder.timed(f"{args.spam} spam", coro)
+        # Throttled replies don't wait on anything, let everyone else run
+        await asyncio.sleep(0)
+
+
+async def giveaway_bursts(
+    cog: main.Commands, users: list, recorder: Recorder, args, deadline: float
+):
+    # Every interval a fresh giveaway goes up and a crowd clicks it in the
+    # same instant, like everyone watching the channel does
+    rtt = args.rtt_ms / 1000
+    rng = random.Random(0)
+    while True:
+        await asyncio.sleep(args.burst_interval)
+        if time.perf_counter() >= deadline:
+            return
+        giveaway = FakeMessage()
+        button = main.PointButton(cog.game, cog.current_week)
+        clickers = rng.sample(users, min(args.burst, len(users)))
+        await asyncio.gather(
+            *(
+                recorder.timed(
+                    "giveaway burst",
+                    button.callback(FakeInteraction(user, rtt, message=giveaway)),
+                )
+                for user in clickers
+            )
+        )
+
+
+async def run(args) -> int:
+    rtt = args.rtt_ms / 1000
+    json_queue = asyncio.Queue()
+    worker = asyncio.ensure_future(main.Jsonfy.process_json_queue(json_queue, 1, 0.1))
+
+    cog = main.Commands(main.bot, json_queue)
+    cog.game = main.Game()
+    await cog.game.setup_week(cog.current_week)
+
+    users = [FakeUser(1000 + i, f"user{i}") for i in range(args.users)]
+    operator = FakeUser(1, "operator", roles=[FakeRole("operator")])
+    options = ",".join(user.name for user in users[: args.options])
+    await cog.set.callback(cog, FakeApplicationContext(operator, rtt), options, "full")
+    for user in users:
+        await cog.game.add_user(user.id)
+        cog.game.users[user.id] = args.start_fluxbux
+        # What cog_before_invoke does for the first command of each user
+        cog.game.set_name(user.id, user.display_name)
+
+    giveaway = FakeMessage()
+    button = main.PointButton(cog.game, cog.current_week)
+
+    recorder = Recorder()
+    lag = []
+    stop = asyncio.Event()
+    monitor = asyncio.ensure_future(monitor_loop_lag(lag, 0.01, stop))
+
+    async def persist_loop():
+        # What Commands.on_ready does once the bot is connected
+        while not stop.is_set():
+            await json_queue.put(main.Jsonfy(cog.game))
+            await asyncio.sleep(args.save_interval)
+
+    saver = asyncio.ensure_future(persist_loop())
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    spammers = [FakeUser(10 + i, f"spammer{i}") for i in range(args.spammers)]
+    await asyncio.gather(
+        *(
+            simulated_user(cog, button, giveaway, user, recorder, args, deadline)
+            for user in users
+        ),
+        *(spammer(cog, user, recorder, args, deadline) for user in spammers),
+        *([giveaway_bursts(cog, users, recorder, args, deadline)] if args.burst else []),
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(monitor, saver)
+    worker.cancel()
+
+    rows = []
+    total = 0
+    for operation, latencies in sorted(recorder.latencies.items()):
+        total += len(latencies)
+        rows.append(
+            [
+                operation,
+                len(latencies),
+                recorder.errors.get(operation, 0),
+                round(percentile(latencies, 0.5) * 1000, 2),
+                round(percentile(latencies, 0.99) * 1000, 2),
+                round(max(latencies) * 1000, 2),
+            ]
+        )
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    print(
+        f"{args.users} users for {round(elapsed, 1)}s with {args.rtt_ms}ms simulated round trips"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=["operation", "ops", "errors", "p50 ms", "p99 ms", "max ms"],
+            tablefmt="outline",
+            numalign="right",
+        )
+    )
+    p99 = percentile(all_latencies, 0.99) * 1000
+    lag_p99 = percentile(lag, 0.99) * 1000
+    print(f"throughput: {round(total / elapsed, 1)} ops/s")
+    print(
+        f"latency: p50 {round(percentile(all_latencies, 0.5) * 1000, 2)}ms, p99 {round(p99, 2)}ms"
+    )
+    print(
+        f"event loop lag: p50 {round(percentile(lag, 0.5) * 1000, 2)}ms, "
+        f"p99 {round(lag_p99, 2)}ms, max {round(max(lag, default=0) * 1000, 2)}ms"
+    )
+    print(f"direct responses: {cog.responder.direct}")
+    print(f"deferred responses: {cog.responder.deferred}")
+    print(f"rate limits: {cog.limiter.stats()}")
+
+    failed = False
+    if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+        print(f"FAIL: p99 latency {round(p99, 2)}ms is over {args.max_p99_ms}ms")
+        failed = True
+    if args.max_lag_ms is not None and lag_p99 > args.max_lag_ms:
+        print(f"FAIL: p99 loop lag {round(lag_p99, 2)}ms is over {args.max_lag_ms}ms")
+        failed = True
+    if sum(recorder.errors.values()):
+        print(f"FAIL: {sum(recorder.errors.values())} operations raised")
+        failed = True
+    return 1 if failed else 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Offline load test for the bot")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--options", type=int, default=8)
+    parser.add_argument("--spammers", type=int, default=0)
+    parser.add_argument(
+        "--spam", choices=["status", "bet", "autocomplete"], default="status"
+    )
+    parser.add_argument("--burst", type=int, default=0)
+    parser.add_argument("--burst-interval", type=float, default=2)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    parser.add_argument("--think-ms", type=float, default=500)
+    parser.add_argument("--start-fluxbux", type=int, default=1000)
+    parser.add_argument("--save-interval", type=float, default=1)
+    parser.add_argument("--max-p99-ms", type=float, default=None)
+    parser.add_argument("--max-lag-ms", type=float, default=None)
+    return parser.parse_args(argv)
+
+
+def init():
+    args = parse_args(sys.argv[1:])
+    # The persistence worker writes database.json and backups to the cwd
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(init())
@@ -1,10 +1,30 @@
 import os
 import sys
+import time
 import asyncio
-import traceback
+import logging
+import logging.handlers
+import queue
+import atexit
+import multiprocessing
+import concurrent.futures
+import cProfile
+import pstats
+import signal
+import io
+import tracemalloc
+import importlib.util
 import discord
 import json
+import marshal
+import bisect
+import csv
+import collections
+import itertools
+from array import array
+import struct
 import aiofiles
+import aiofiles.os
 from tabulate import tabulate
 from typing import Callable
 from datetime import date, datetime, timedelta, timezone
@@ -18,9 +38,68 @@ GUILDS = GUILDS.split(",") if "," in GUILDS else [GUILDS]
 GUILDS = [int(guild) for guild in GUILDS]
 OPERATOR_ROLE = os.getenv("OPERATOR_ROLE")
 OPERATOR_ID = os.getenv("OPERATOR_ID")
-
-
-async def string_dict(
+DATABASE_CODEC = os.getenv("DATABASE_CODEC", "json")
+# Binary snapshots aren't json, they get a file name of their own
+DATABASE_PATH = "database.bin" if DATABASE_CODEC == "binary" else "database.json"
+CHANGES_DIR = os.getenv("CHANGES_DIR", "changes")
+# Closed years are saved here once instead of with every save
+COLD_DIR = os.getenv("COLD_DIR", "cold")
+# Bump whenever the attributes of Game or the state handed over by
+# Commands.take_over change, /reload refuses to hand state to code that
+# expects a different schema
+STATE_SCHEMA_VERSION = 6
+# The house's balance is kept under an ID no Discord account has
+HOUSE_ID = 0
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per subsystem overrides, e.g. "fluxbux.game=DEBUG,discord=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FILE = os.getenv("LOG_FILE", "logs/fluxbux.log")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Where heavy work goes once it's estimated to take longer than the budget:
+# process, thread or inline to never offload
+COMPUTE_POOL = os.getenv("COMPUTE_POOL", "process")
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", "2"))
+COMPUTE_INLINE_BUDGET = float(os.getenv("COMPUTE_INLINE_BUDGET", "0.005"))
+
+log = logging.getLogger("fluxbux")
+game_log = logging.getLogger("fluxbux.game")
+commands_log = logging.getLogger("fluxbux.commands")
+persist_log = logging.getLogger("fluxbux.persist")
+
+# Run as a hot standby, the process holding LOCK_PATH serves and the
+# others follow its saves until they can take the lock
+STANDBY = os.getenv("STANDBY", "0") == "1"
+# Token buckets per user and command class, capacity:refill per second:cost,
+# override with e.g. RATE_LIMITS="status=3:0.2:1,autocomplete=20:4:1"
+RATE_LIMITS = {
+    "status": (3, 0.2, 1),
+    "bet": (5, 0.5, 1),
+    "remove_bet": (5, 0.5, 1),
+    "autocomplete": (20, 4, 1),
+}
+for override in filter(None, os.getenv("RATE_LIMITS", "").split(",")):
+    kind, limit = override.split("=")
+    capacity, rate, cost = limit.split(":")
+    RATE_LIMITS[kind.strip()] = (float(capacity), float(rate), float(cost))
+LOCK_PATH = os.getenv("LOCK_PATH", "fluxbux.lock")
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def format_dict(
     dictionary: dict,
     listed: bool = False,
     table_listed: bool = False,
@@ -86,11 +165,68 @@ async def string_dict(
     )
 
 
-async def print_return(statement: str) -> str:
-    print(statement)
+async def string_dict(dictionary: dict, **kwargs):
+    return format_dict(dictionary, **kwargs)
+
+
+async def log_return(statement: str) -> str:
+    game_log.info(statement)
     return statement
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the record before queueing it, the
+    # queue never leaves the process so leave all formatting to the listener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    # Loggers only put records on a queue, a listener thread formats and
+    # writes them so a slow stdout or disk never blocks the event loop
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+    handlers = [stream]
+    if LOG_FILE:
+        Path(LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+        rotating = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8"
+        )
+        rotating.setFormatter(formatter)
+        handlers.append(rotating)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [DeferredQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL.upper())
+    for override in filter(None, LOG_LEVELS.split(",")):
+        name, level = override.split("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
 def check_operator_roles() -> Callable:
     async def inner(ctx: discord.ApplicationContext):
         if OPERATOR_ROLE == [None]:
@@ -98,7 +234,6 @@ def check_operator_roles() -> Callable:
         if ctx.user.id == int(OPERATOR_ID):
             return True
         if not any(role.name.lower() in OPERATOR_ROLE for role in ctx.user.roles):
-            await ctx.defer(ephemeral=True)
             await ctx.respond(
                 f"You don't have permission, list of roles is {OPERATOR_ROLE}",
                 ephemeral=True,
@@ -110,10 +245,940 @@ def check_operator_roles() -> Callable:
     return inner
 
 
+def week_key(day: date = None) -> str:
+    # ISO year and week, sorts in time order as a plain string
+    iso = (day or date.today()).isocalendar()
+    return f"{iso.year}-W{iso.week:02d}"
+
+
+def week_year(week: str) -> int:
+    return int(week.split("-W")[0])
+
+
+def parse_week(text: str) -> str:
+    # Normalises "2026-W05", "2026-w5" or "2026W5" to the key, None for
+    # anything that isn't a year and week
+    year, separator, number = text.strip().upper().partition("W")
+    year = year.rstrip("-")
+    if not separator or len(year) != 4 or not year.isdecimal() or not number.isdecimal():
+        return None
+    if not 1 <= int(number) <= 53:
+        return None
+    return f"{year}-W{int(number):02d}"
+
+
+def infer_week_years(keys: list, today: date = None) -> dict:
+    # Old keys are bare ISO week numbers in the order they were created,
+    # walking back from the newest one every wrap around means a year earlier
+    iso = (today or date.today()).isocalendar()
+    mapping = {}
+    year = None
+    previous = None
+    for key in reversed(keys):
+        number = int(key)
+        if year is None:
+            year = iso.year if number <= iso.week else iso.year - 1
+        elif number >= previous:
+            year -= 1
+        previous = number
+        mapping[key] = f"{year}-W{number:02d}"
+    return mapping
+
+
+class AdaptiveResponder:
+    # Discord needs the first response within 3 seconds, anything that isn't
+    # done by MAX_BUDGET gets deferred so the follow-up still fits
+    MAX_BUDGET = 2.0
+    MIN_BUDGET = 0.05
+    DEFAULT_BUDGET = 1.0
+    ALPHA = 0.125
+    BETA = 0.25
+
+    def __init__(self):
+        self.latency = {}  # command -> smoothed compute time in seconds
+        self.deviation = {}  # command -> smoothed deviation of the compute time
+        self.direct = {}  # command -> responses sent without a defer
+        self.deferred = {}  # command -> responses that needed a defer
+
+    def budget(self, name: str) -> float:
+        if name not in self.latency:
+            return self.DEFAULT_BUDGET
+        if self.latency[name] > self.MAX_BUDGET:
+            # Always slow, don't wait before deferring
+            return 0
+        budget = self.latency[name] + 4 * self.deviation[name]
+        return min(max(budget, self.MIN_BUDGET), self.MAX_BUDGET)
+
+    def observe(self, name: str, elapsed: float):
+        # Same smoothing as a TCP retransmit timer
+        if name not in self.latency:
+            self.latency[name] = elapsed
+            self.deviation[name] = elapsed / 2
+            return
+        error = elapsed - self.latency[name]
+        self.latency[name] += self.ALPHA * error
+        self.deviation[name] += self.BETA * (abs(error) - self.deviation[name])
+
+    @staticmethod
+    def respond_kwargs(result) -> dict:
+        if isinstance(result, dict):
+            return result
+        if isinstance(result, discord.Embed):
+            return {"embed": result}
+        return {"content": result}
+
+    async def respond(
+        self,
+        ctx: discord.ApplicationContext,
+        name: str,
+        coro,
+        ephemeral: bool = False,
+    ):
+        start = time.perf_counter()
+        task = asyncio.ensure_future(coro)
+        task.add_done_callback(
+            lambda _: self.observe(name, time.perf_counter() - start)
+        )
+        # The 3 seconds started when the interaction was created, time it
+        # spent waiting on a busy loop comes off the budget
+        age = (
+            datetime.now(timezone.utc) - discord.utils.snowflake_time(ctx.interaction.id)
+        ).total_seconds()
+        budget = min(self.budget(name), self.MAX_BUDGET - max(age, 0))
+        if budget > 0:
+            await asyncio.wait({task}, timeout=budget)
+        if task.done():
+            self.direct[name] = self.direct.get(name, 0) + 1
+        else:
+            self.deferred[name] = self.deferred.get(name, 0) + 1
+            await ctx.defer(ephemeral=ephemeral)
+        result = await task
+        await ctx.respond(**self.respond_kwargs(result), ephemeral=ephemeral)
+
+
+# Snapshot files start with MAGIC, a format version and the codec id.
+# Files without the header are the old indented json and still load.
+SNAPSHOT_MAGIC = b"FBX"
+SNAPSHOT_VERSION = 1
+
+
+class JsonCodec:
+    codec_id = 1
+    name = "json"
+    offload = False  # C encoder, done before a copy for a thread would be
+
+    def encode(self, data: dict) -> bytes:
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+    def decode(self, payload: bytes) -> dict:
+        return json.loads(payload)
+
+
+class FastJsonCodec:
+    # Same json on disk, encoded with orjson or msgspec when one is installed
+    codec_id = 2
+    name = "fastjson"
+    offload = False
+
+    def __init__(self):
+        if orjson is not None:
+            self.backend = "orjson"
+        elif msgspec is not None:
+            self.backend = "msgspec"
+            self.encoder = msgspec.json.Encoder()
+            self.decoder = msgspec.json.Decoder()
+        else:
+            self.backend = "json"
+
+    def encode(self, data: dict) -> bytes:
+        if self.backend == "orjson":
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        if self.backend == "msgspec":
+            return self.encoder.encode(data)
+        return JsonCodec().encode(data)
+
+    def decode(self, payload: bytes) -> dict:
+        if self.backend == "orjson":
+            return orjson.loads(payload)
+        if self.backend == "msgspec":
+            return self.decoder.decode(payload)
+        return json.loads(payload)
+
+
+class BinaryCodec:
+    # Stdlib only. The payload is a table of every distinct string followed by
+    # the value tree, every value is a one byte type tag and its payload.
+    # Strings in the tree are indexes into the table, since the same option
+    # names show up in the options, pools and bets of every week.
+    # It buys size, not speed: saves are a good deal smaller than json but
+    # being pure Python it encodes and decodes slower than the C json
+    # encoders, so saves run it off the loop.
+    codec_id = 3
+    name = "binary"
+    offload = True
+
+    NONE = 0x00
+    TRUE = 0x01
+    FALSE = 0x02
+    INT8 = 0x03
+    INT32 = 0x04
+    INT64 = 0x05
+    BIGINT = 0x06
+    FLOAT = 0x07
+    STR = 0x08
+    LIST = 0x09
+    MAP = 0x0A
+
+    U32 = struct.Struct("<I")
+    I8 = struct.Struct("<b")
+    I32 = struct.Struct("<i")
+    I64 = struct.Struct("<q")
+    F64 = struct.Struct("<d")
+
+    def encode(self, data: dict) -> bytes:
+        strings = {}
+        body = bytearray()
+        self._encode_value(data, body, strings)
+
+        table = bytearray(self.U32.pack(len(strings)))
+        for string in strings:
+            raw = string.encode("utf-8")
+            table += self.U32.pack(len(raw))
+            table += raw
+        return bytes(table + body)
+
+    def _encode_value(self, value, out: bytearray, strings: dict):
+        if isinstance(value, str):
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(strings)
+            out.append(self.STR)
+            out += self.U32.pack(index)
+        elif value is None:
+            out.append(self.NONE)
+        elif value is True:
+            out.append(self.TRUE)
+        elif value is False:
+            out.append(self.FALSE)
+        elif isinstance(value, int):
+            if -(2**7) <= value < 2**7:
+                out.append(self.INT8)
+                out += self.I8.pack(value)
+            elif -(2**31) <= value < 2**31:
+                out.append(self.INT32)
+                out += self.I32.pack(value)
+            elif -(2**63) <= value < 2**63:
+                out.append(self.INT64)
+                out += self.I64.pack(value)
+            else:
+                raw = str(value).encode("ascii")
+                out.append(self.BIGINT)
+                out += self.U32.pack(len(raw))
+                out += raw
+        elif isinstance(value, float):
+            out.append(self.FLOAT)
+            out += self.F64.pack(value)
+        elif isinstance(value, dict):
+            out.append(self.MAP)
+            out += self.U32.pack(len(value))
+            for key, item in value.items():
+                self._encode_value(key, out, strings)
+                self._encode_value(item, out, strings)
+        elif isinstance(value, (list, tuple)):
+            out.append(self.LIST)
+            out += self.U32.pack(len(value))
+            for item in value:
+                self._encode_value(item, out, strings)
+        else:
+            raise TypeError(f"Can't encode {type(value).__name__} in a snapshot")
+
+    def decode(self, payload: bytes) -> dict:
+        view = memoryview(payload)
+        count = self.U32.unpack_from(view, 0)[0]
+        offset = 4
+        strings = []
+        for _ in range(count):
+            length = self.U32.unpack_from(view, offset)[0]
+            offset += 4
+            if offset + length > len(view):
+                raise ValueError("Truncated snapshot")
+            strings.append(str(view[offset : offset + length], "utf-8"))
+            offset += length
+
+        value, offset = self._decode_value(view, offset, strings)
+        if offset != len(payload):
+            raise ValueError("Trailing data after snapshot")
+        return value
+
+    def _decode_value(self, view: memoryview, offset: int, strings: list):
+        tag = view[offset]
+        offset += 1
+        if tag == self.STR:
+            return strings[self.U32.unpack_from(view, offset)[0]], offset + 4
+        if tag == self.INT8:
+            return self.I8.unpack_from(view, offset)[0], offset + 1
+        if tag == self.INT32:
+            return self.I32.unpack_from(view, offset)[0], offset + 4
+        if tag == self.MAP:
+            count = self.U32.unpack_from(view, offset)[0]
+            offset += 4
+            mapping = {}
+            for _ in range(count):
+                key, offset = self._decode_value(view, offset, strings)
+                mapping[key], offset = self._decode_value(view, offset, strings)
+            return mapping, offset
+        if tag == self.LIST:
+            count = self.U32.unpack_from(view, offset)[0]
+            offset += 4
+            items = []
+            for _ in range(count):
+                item, offset = self._decode_value(view, offset, strings)
+                items.append(item)
+            return items, offset
+        if tag == self.NONE:
+            return None, offset
+        if tag == self.TRUE:
+            return True, offset
+        if tag == self.FALSE:
+            return False, offset
+        if tag == self.INT64:
+            return self.I64.unpack_from(view, offset)[0], offset + 8
+        if tag == self.FLOAT:
+            return self.F64.unpack_from(view, offset)[0], offset + 8
+        if tag == self.BIGINT:
+            length = self.U32.unpack_from(view, offset)[0]
+            offset += 4
+            if offset + length > len(view):
+                raise ValueError("Truncated snapshot")
+            return int(str(view[offset : offset + length], "ascii")), offset + length
+        raise ValueError(f"Unknown type tag {tag} in snapshot")
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), FastJsonCodec(), BinaryCodec())}
+CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+if DATABASE_CODEC not in CODECS:
+    raise ValueError(
+        f"DATABASE_CODEC is {DATABASE_CODEC!r}, it has to be one of {', '.join(CODECS)}"
+    )
+
+
+def encode_snapshot(data: dict, codec_name: str = DATABASE_CODEC) -> bytes:
+    codec = CODECS[codec_name]
+    header = SNAPSHOT_MAGIC + bytes((SNAPSHOT_VERSION, codec.codec_id))
+    return header + codec.encode(data)
+
+
+def decode_snapshot(raw: bytes) -> dict:
+    if not raw.startswith(SNAPSHOT_MAGIC):
+        # Old database.json written with json.dumps(indent=4)
+        return json.loads(raw)
+    version, codec_id = raw[3], raw[4]
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    if codec_id not in CODECS_BY_ID:
+        raise ValueError(f"Unknown snapshot codec {codec_id}")
+    return CODECS_BY_ID[codec_id].decode(raw[5:])
+
+
+class Profiler:
+    # Nothing is hooked while inactive, cProfile, the SIGPROF timer and
+    # tracemalloc are only switched on for the profiling window
+    SAMPLE_INTERVAL = 0.005
+    STACK_DEPTH = 8
+
+    def __init__(self):
+        self.active = False
+        self.mode = None
+        self.remaining_commands = None
+        self.profile = None
+        self.samples = {}  # stack -> number of samples
+        self.started_at = None
+        self.elapsed = None
+        self.allocations = None
+        self.timer = None
+        self.done = None
+
+    async def start(self, mode: str, seconds: int, commands: int = None):
+        self.active = True
+        self.mode = mode
+        self.remaining_commands = commands
+        self.samples = {}
+        self.started_at = time.perf_counter()
+        self.done = asyncio.Event()
+        tracemalloc.start(10)
+        if mode == "sampling":
+            signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(
+                signal.ITIMER_PROF, self.SAMPLE_INTERVAL, self.SAMPLE_INTERVAL
+            )
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.timer = asyncio.ensure_future(self._stop_after(seconds))
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None and len(stack) < self.STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{Path(code.co_filename).name}:{frame.f_lineno}({code.co_name})")
+            frame = frame.f_back
+        stack = tuple(stack)
+        self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    async def _stop_after(self, seconds: int):
+        await asyncio.sleep(seconds)
+        self.stop()
+
+    def command_done(self):
+        if self.remaining_commands is None:
+            return
+        self.remaining_commands -= 1
+        if self.remaining_commands <= 0:
+            self.stop()
+
+    def stop(self):
+        if not self.active:
+            return
+        if self.mode == "sampling":
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        else:
+            self.profile.disable()
+        self.allocations = tracemalloc.take_snapshot().statistics("lineno")
+        tracemalloc.stop()
+        self.elapsed = time.perf_counter() - self.started_at
+        self.active = False
+        if self.timer is not None and not self.timer.done():
+            self.timer.cancel()
+        self.done.set()
+
+    async def report(self, top: int = 10) -> str:
+        await self.done.wait()
+        Path("profiles").mkdir(exist_ok=True)
+        path = f"profiles/profile_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+
+        full = io.StringIO()
+        full.write(f"{self.mode} profile over {round(self.elapsed, 2)}s\n\n")
+        if self.mode == "sampling":
+            hottest = sorted(self.samples.items(), key=lambda item: item[1], reverse=True)
+            total = sum(self.samples.values())
+            full.write(f"{total} samples every {self.SAMPLE_INTERVAL}s of cpu time\n")
+            for stack, count in hottest:
+                full.write(f"\n{count} samples\n")
+                full.write("\n".join(f"    {frame}" for frame in stack) + "\n")
+            functions = {}
+            for stack, count in self.samples.items():
+                functions[stack[0]] = functions.get(stack[0], 0) + count
+            summary = [
+                f"{count:>6} {frame}"
+                for frame, count in sorted(
+                    functions.items(), key=lambda item: item[1], reverse=True
+                )[:top]
+            ]
+        else:
+            stats = pstats.Stats(self.profile, stream=full)
+            stats.sort_stats("cumulative").print_stats(50)
+            hottest = sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True
+            )[:top]
+            summary = [
+                f"{round(cumulative * 1000, 1):>8}ms {calls:>6} {Path(file).name}:{line}({function})"
+                for (file, line, function), (_, calls, _, cumulative, _) in hottest
+            ]
+            self.profile = None
+
+        full.write("\nTop allocation sites\n")
+        for stat in self.allocations[:50]:
+            full.write(f"{stat}\n")
+        allocations = [
+            f"{round(stat.size / 1024, 1):>8}KiB {stat.count:>6} "
+            f"{Path(stat.traceback[0].filename).name}:{stat.traceback[0].lineno}"
+            for stat in self.allocations[:5]
+        ]
+        self.allocations = None
+
+        async with aiofiles.open(path, "w", encoding="utf-8") as f:
+            await f.write(full.getvalue())
+
+        summary = "\n".join(summary)
+        allocations = "\n".join(allocations)
+        return (
+            f"{self.mode} profile over {round(self.elapsed, 2)}s, full stats in `{path}`\n"
+            f"**Hottest functions**\n```\n{summary[:900]}\n```\n"
+            f"**Top allocation sites**\n```\n{allocations[:600]}\n```"
+        )
+
+
+class ChangeFeed:
+    # Every mutation of the game gets the next sequence number, the number is
+    # saved with the game so cursors stay valid across restarts. Events are
+    # kept until the exporter has written them out.
+    MAX_PENDING = 100_000
+    FIELDS = ["seq", "time", "kind", "week", "user", "target", "option", "points", "outcome"]
+
+    def __init__(self, seq: int = 0):
+        self.seq = seq
+        self.events = collections.deque(maxlen=self.MAX_PENDING)
+        self.listeners = []
+
+    def emit(self, kind: str, **fields):
+        self.seq += 1
+        event = {"seq": self.seq, "time": round(time.time(), 3), "kind": kind, **fields}
+        self.events.append(event)
+        for listener in self.listeners:
+            listener(event)
+
+    def since(self, cursor: int) -> list:
+        # Only what was exported is trimmed, so the skip is usually nothing
+        if not self.events:
+            return []
+        start = max(0, cursor - self.events[0]["seq"] + 1)
+        return list(itertools.islice(self.events, start, None))
+
+    def trim(self, cursor: int):
+        while self.events and self.events[0]["seq"] <= cursor:
+            self.events.popleft()
+
+    def skip_past(self, cursor: int) -> int:
+        # A game restored from a save older than the last export hands out
+        # numbers that were exported already, move what's pending past them
+        floor = self.events[0]["seq"] - 1 if self.events else self.seq
+        shift = cursor - floor
+        if shift <= 0:
+            return 0
+        for event in self.events:
+            event["seq"] += shift
+        self.seq += shift
+        return shift
+
+
+class Rollup:
+    # Low, high and last balance per time bucket, oldest buckets fall off
+    def __init__(self, size: int, limit: int, data=None):
+        self.size = size
+        self.limit = limit
+        data = data or [[], [], [], []]
+        self.keys = array("q", data[0])
+        self.lows = array("q", data[1])
+        self.highs = array("q", data[2])
+        self.closes = array("q", data[3])
+
+    def add(self, timestamp: float, balance: int):
+        key = int(timestamp // self.size)
+        if self.keys and self.keys[-1] == key:
+            self.lows[-1] = min(self.lows[-1], balance)
+            self.highs[-1] = max(self.highs[-1], balance)
+            self.closes[-1] = balance
+            return
+        self.keys.append(key)
+        self.lows.append(balance)
+        self.highs.append(balance)
+        self.closes.append(balance)
+        if len(self.keys) > self.limit:
+            for column in (self.keys, self.lows, self.highs, self.closes):
+                del column[0]
+
+    def to_json(self) -> list:
+        return [self.keys.tolist(), self.lows.tolist(), self.highs.tolist(), self.closes.tolist()]
+
+
+class BalanceSeries:
+    DAY = 86400
+    # Weeks start on monday, the epoch was a thursday
+    WEEK_OFFSET = 3 * DAY
+    RAW_FULL_AGE = 2 * DAY  # newer points are all kept
+    RAW_DOWNSAMPLE = 3600  # older points keep the last one per hour
+    RAW_MAX_AGE = 14 * DAY  # points older than this are dropped
+    RAW_MAX_POINTS = 2000
+    RAW_LOW_WATER = 1500  # trimmed down to this, so trims are rare
+    DAILY_LIMIT = 120
+    WEEKLY_LIMIT = 104
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.times = array("d", data.get("times", []))
+        self.balances = array("q", data.get("balances", []))
+        self.daily = Rollup(self.DAY, self.DAILY_LIMIT, data.get("daily"))
+        self.weekly = Rollup(7 * self.DAY, self.WEEKLY_LIMIT, data.get("weekly"))
+
+    def record(self, timestamp: float, balance: int):
+        self.times.append(timestamp)
+        self.balances.append(balance)
+        self.daily.add(timestamp, balance)
+        self.weekly.add(timestamp + self.WEEK_OFFSET, balance)
+        if len(self.times) > self.RAW_MAX_POINTS:
+            self.compact(timestamp)
+            if len(self.times) > self.RAW_LOW_WATER:
+                excess = len(self.times) - self.RAW_LOW_WATER
+                del self.times[:excess]
+                del self.balances[:excess]
+
+    def compact(self, now: float):
+        full_after = now - self.RAW_FULL_AGE
+        expire_before = now - self.RAW_MAX_AGE
+        times = array("d")
+        balances = array("q")
+        for i, timestamp in enumerate(self.times):
+            if timestamp < expire_before:
+                continue
+            if timestamp < full_after:
+                # Only keep the point if it's the last one of its hour
+                following = self.times[i + 1] if i + 1 < len(self.times) else None
+                if following is not None and following < full_after and (
+                    following // self.RAW_DOWNSAMPLE == timestamp // self.RAW_DOWNSAMPLE
+                ):
+                    continue
+            times.append(timestamp)
+            balances.append(self.balances[i])
+        self.times = times
+        self.balances = balances
+
+    def to_json(self) -> dict:
+        # Raw points only live in memory, trends are drawn from the rollups
+        return {
+            "daily": self.daily.to_json(),
+            "weekly": self.weekly.to_json(),
+        }
+
+
+class BalanceHistory:
+    # Kinds of change feed events that move a balance
+    BALANCE_EVENTS = {"give", "claim", "transfer", "settlement"}
+    SPARK = "▁▂▃▄▅▆▇█"
+    MAINTAIN_INTERVAL = 3600
+
+    def __init__(self, data=None):
+        self.series = {
+            user: BalanceSeries(series) for user, series in (data or {}).items()
+        }
+        self.last_maintained = 0
+
+    def record(self, user: int, balance: int, timestamp: float = None):
+        if user not in self.series:
+            self.series[user] = BalanceSeries()
+        self.series[user].record(timestamp or time.time(), balance)
+
+    def maintain(self, now: float = None):
+        now = now or time.time()
+        if now - self.last_maintained < self.MAINTAIN_INTERVAL:
+            return
+        self.last_maintained = now
+        for series in self.series.values():
+            series.compact(now)
+
+    def sparkline(self, user: int, period: str = "daily", width: int = 14) -> str:
+        if user not in self.series:
+            return None
+        rollup = getattr(self.series[user], period)
+        closes = rollup.closes[-width:]
+        low, high = min(closes), max(closes)
+        span = high - low or 1
+        return "".join(
+            self.SPARK[(value - low) * (len(self.SPARK) - 1) // span] for value in closes
+        )
+
+    def to_json(self) -> dict:
+        return {user: series.to_json() for user, series in self.series.items()}
+
+
+class StatusBoard:
+    # Keeps the posted status messages in Game.boards up to date. Changes
+    # are collected for DEBOUNCE seconds so a burst of bets is one edit, and
+    # a message is edited at most once every MIN_EDIT_INTERVAL seconds.
+    DEBOUNCE = 2.0
+    MIN_EDIT_INTERVAL = 5.0
+
+    def __init__(self, bot: discord.Bot, game):
+        self.bot = bot
+        self.game = game
+        self.dirty = set()
+        self.last_edit = {}  # week -> time of the last edit
+        self.flush_task = None
+        self.edits = 0
+        self.changes = 0
+
+    def start(self):
+        self.game.feed.listeners.append(self.on_change)
+        # Boards of settled weeks got their last edit with the payout
+        for week in [week for week in self.game.boards if not self.running(week)]:
+            del self.game.boards[week]
+        # Catch up on anything that changed while we were down
+        self.mark(*self.game.boards)
+
+    def stop(self):
+        if self.on_change in self.game.feed.listeners:
+            self.game.feed.listeners.remove(self.on_change)
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+
+    def running(self, week: str) -> bool:
+        return week in self.game.weeks and not self.game.weeks[week].get("result")
+
+    def on_change(self, event: dict):
+        if not self.game.boards:
+            return
+        self.changes += 1
+        if event.get("week") in self.game.boards:
+            self.mark(event["week"])
+        if event["kind"] in BalanceHistory.BALANCE_EVENTS:
+            # Balances show up on every board of a week that isn't paid out
+            self.mark(*(week for week in self.game.boards if self.running(week)))
+
+    def mark(self, *weeks):
+        self.dirty.update(weeks)
+        if self.dirty and (self.flush_task is None or self.flush_task.done()):
+            self.flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        await asyncio.sleep(self.DEBOUNCE)
+        while self.dirty:
+            week = min(self.dirty, key=lambda week: self.last_edit.get(week, 0))
+            wait = self.last_edit.get(week, 0) + self.MIN_EDIT_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.dirty.discard(week)
+            self.last_edit[week] = time.monotonic()
+            await self.edit(week)
+
+    async def edit(self, week: str):
+        if week not in self.game.boards:
+            return
+        channel_id, message_id = self.game.boards[week]
+        try:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(
+                channel_id
+            )
+            content = await self.game.print_status(week)
+            await channel.get_partial_message(message_id).edit(content=content)
+            self.edits += 1
+            if not self.running(week):
+                # That was the payout, nothing changes it anymore
+                self.game.boards.pop(week, None)
+        except discord.NotFound:
+            commands_log.info("Status board for week %s was deleted", week)
+            del self.game.boards[week]
+        except discord.HTTPException as e:
+            commands_log.warning("Editing the status board for week %s failed: %s", week, e)
+            if e.status == 429:
+                # Try again once the rate limit is over
+                self.last_edit[week] = time.monotonic() + float(
+                    getattr(e.response, "headers", {}).get("Retry-After", 5)
+                )
+                self.mark(week)
+
+
+class ChangeExporter:
+    # Appends new events to changes.ndjson and changes.csv, the last exported
+    # sequence number is kept in the cursor file. Delivery is at least once,
+    # readers should skip sequence numbers they've seen.
+    def __init__(self, feed: ChangeFeed, directory: str = CHANGES_DIR):
+        self.feed = feed
+        self.directory = Path(directory)
+        self.cursor_path = self.directory / "cursor"
+        self.ndjson_path = self.directory / "changes.ndjson"
+        self.csv_path = self.directory / "changes.csv"
+        self.cursor = None
+
+    async def load_cursor(self):
+        self.directory.mkdir(exist_ok=True)
+        try:
+            async with aiofiles.open(self.cursor_path, "r", encoding="utf-8") as f:
+                self.cursor = int(await f.read())
+        except (FileNotFoundError, ValueError):
+            # Nothing exported yet, start from what's still in memory
+            self.cursor = self.feed.events[0]["seq"] - 1 if self.feed.events else self.feed.seq
+
+    async def export(self) -> int:
+        if self.cursor is None:
+            await self.load_cursor()
+        shift = self.feed.skip_past(self.cursor)
+        if shift:
+            persist_log.warning(
+                "Change feed was %s behind the export cursor %s, renumbered pending events",
+                shift,
+                self.cursor,
+            )
+        events = self.feed.since(self.cursor)
+        if not events:
+            return 0
+        if events[0]["seq"] > self.cursor + 1:
+            persist_log.warning(
+                "Change feed dropped events %s to %s", self.cursor + 1, events[0]["seq"] - 1
+            )
+
+        ndjson = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+        rows = io.StringIO()
+        writer = csv.DictWriter(rows, fieldnames=ChangeFeed.FIELDS, extrasaction="ignore")
+        if not self.csv_path.exists():
+            writer.writeheader()
+        writer.writerows(events)
+
+        async with aiofiles.open(self.ndjson_path, "a", encoding="utf-8") as f:
+            await f.write(ndjson)
+        async with aiofiles.open(self.csv_path, "a", encoding="utf-8", newline="") as f:
+            await f.write(rows.getvalue())
+
+        self.cursor = events[-1]["seq"]
+        async with aiofiles.open(self.cursor_path, "w", encoding="utf-8") as f:
+            await f.write(str(self.cursor))
+        self.feed.trim(self.cursor)
+        return len(events)
+
+    async def run(self, interval: float):
+        while True:
+            try:
+                await self.export()
+            except Exception:
+                persist_log.exception("Change export failed")
+            await asyncio.sleep(interval)
+
+
+def read_changes(path: str, position: int = 0):
+    # For analytics jobs, yields each event with the byte position after it,
+    # pass the last position back in to continue where it left off
+    with open(path, "rb") as f:
+        f.seek(position)
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Still being written
+                return
+            position += len(line)
+            yield json.loads(line), position
+
+
+class RateLimiter:
+    # Buckets start full, so one that has refilled to capacity is the same as
+    # no bucket and gets dropped by the sweep
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, limits: dict = None):
+        self.limits = limits if limits is not None else RATE_LIMITS
+        self.buckets = {}  # (user id, command class) -> [tokens, last update, last reply]
+        self.allowed = {}  # command class -> calls let through
+        self.throttled = {}  # command class -> calls turned away
+        self.saved = {}  # command class -> estimated seconds of work not done
+        self.last_sweep = time.monotonic()
+
+    def acquire(self, user_id: int, kind: str, estimate: float = 0) -> float:
+        # Returns 0 when the call may go ahead, otherwise seconds until it may
+        if kind not in self.limits:
+            return 0
+        capacity, rate, cost = self.limits[kind]
+        now = time.monotonic()
+        if now - self.last_sweep >= self.SWEEP_INTERVAL:
+            self.sweep(now)
+        key = (user_id, kind)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [capacity, now, None]
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed[kind] = self.allowed.get(kind, 0) + 1
+            return 0
+        self.throttled[kind] = self.throttled.get(kind, 0) + 1
+        self.saved[kind] = self.saved.get(kind, 0) + estimate
+        return (cost - bucket[0]) / rate
+
+    def remember(self, user_id: int, kind: str, reply, key=None):
+        # key is what the reply answers, a cached reply is only handed out
+        # for the same key
+        bucket = self.buckets.get((user_id, kind))
+        if bucket is not None:
+            bucket[2] = (key, reply)
+
+    def cached(self, user_id: int, kind: str, key=None):
+        bucket = self.buckets.get((user_id, kind))
+        if bucket is None or bucket[2] is None or bucket[2][0] != key:
+            return None
+        return bucket[2][1]
+
+    def sweep(self, now: float):
+        self.last_sweep = now
+        for key, (tokens, updated, _) in list(self.buckets.items()):
+            capacity, rate, _ = self.limits[key[1]]
+            if tokens + (now - updated) * rate >= capacity:
+                del self.buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            kind: {
+                "allowed": self.allowed.get(kind, 0),
+                "throttled": self.throttled.get(kind, 0),
+                "saved_ms": round(self.saved.get(kind, 0) * 1000, 1),
+            }
+            for kind in self.limits
+        }
+
+
+def newest_database(path: str = DATABASE_PATH) -> str:
+    # After switching codecs the last save can still have the other name
+    candidates = [
+        candidate
+        for candidate in dict.fromkeys((path, "database.json", "database.bin"))
+        if os.path.exists(candidate)
+    ]
+    return max(candidates, key=os.path.getmtime, default=path)
+
+
+async def replace_file(path: str, data: bytes):
+    # Replace in one go, a standby never reads half a save
+    async with aiofiles.open(f"{path}.tmp", "wb") as f:
+        await f.write(data)
+    await aiofiles.os.replace(f"{path}.tmp", path)
+
+
+def cold_year_path(year: str, cold_dir: str = COLD_DIR) -> str:
+    return f"{cold_dir}/weeks_{year}"
+
+
+def read_cold_years(cold_dir: str = COLD_DIR) -> dict:
+    cold = {}
+    for path in sorted(Path(cold_dir).glob("weeks_*")):
+        if path.suffix == ".tmp":
+            continue
+        cold[path.name.split("_", 1)[1]] = decode_snapshot(path.read_bytes())
+    return cold
+
+
 class Jsonfy:
     def __init__(self, game):
         self.game = game
 
+    async def save(self):
+        # Runs the code of whoever queued the save, after /reload that's the
+        # new code even though the queue loop is the old one
+        formatted_date = datetime.now().strftime("%Y-%m-%d")
+        Path("backup").mkdir(exist_ok=True)
+
+        # Closed years are written once, before the save that leaves them out
+        for year, weeks in self.game.unsaved_cold_years().items():
+            Path(COLD_DIR).mkdir(exist_ok=True)
+            # Cold years don't change, no copy needed
+            cold = await asyncio.to_thread(encode_snapshot, weeks)
+            await replace_file(cold_year_path(year), cold)
+            self.game.cold_saved.add(year)
+        data = await self.game.to_json()
+        if CODECS[DATABASE_CODEC].offload:
+            # Copied in one go on the loop, commands keep changing the game
+            # while the thread encodes
+            data = marshal.loads(marshal.dumps(data))
+            snapshot = await asyncio.to_thread(encode_snapshot, data)
+        else:
+            snapshot = encode_snapshot(data)
+        await replace_file(DATABASE_PATH, snapshot)
+
+        # Save a backup, this is not ran if the first save fails. The
+        # extension is the codec, a binary backup isn't json
+        async with aiofiles.open(
+            f"backup/database_{formatted_date}.{DATABASE_CODEC}", "wb"
+        ) as f:
+            await f.write(snapshot)
+
     @staticmethod
     async def process_json_queue(json_queue, PROCESS_WAIT_TIME, EMPTY_WAIT_TIME):
         while True:
@@ -124,59 +1189,558 @@ class Jsonfy:
                     continue
                 to_json = await json_queue.get()
 
-                formatted_date = datetime.now().strftime("%Y-%m-%d")
-                Path("backup").mkdir(exist_ok=True)
-
                 try:
-                    async with aiofiles.open(
-                        "database.json", "w", encoding="utf-8"
-                    ) as f:
-                        await f.write(
-                            json.dumps(await to_json.game.to_json(), indent=4)
-                        )
-                except Exception:
+                    await to_json.save()
+                finally:
                     await asyncio.sleep(PROCESS_WAIT_TIME)
-                    raise
+            except Exception:
+                persist_log.exception("Saving the database failed")
+
+
+# Pure functions for work that may run in a worker process, they only see
+# the copies they are given and return the result
+
+
+def payout_ratio(options: list) -> float:
+    winning_probability = 1 / len(options)
+    ratio = (1 - winning_probability) / winning_probability
+    ratio = round(ratio, 2)
+    return ratio
+
+
+def user_labels(user_ids, names: dict) -> dict:
+    # Display names aren't unique, the ID tells two of the same name apart
+    labels = {}
+    taken = set()
+    for user_id in user_ids:
+        if user_id in labels:
+            continue
+        label = names.get(user_id, str(user_id))
+        if label in taken:
+            label = f"{label} ({user_id})"
+        taken.add(label)
+        labels[user_id] = label
+    return labels
+
+
+def render_status(
+    users: dict, betting_pool: dict, bets: dict, week: str, names: dict
+) -> str:
+    labels = user_labels([*users, *bets], names)
+    users = {labels[user]: balance for user, balance in users.items()}
+    bets = {labels[user]: user_bets for user, user_bets in bets.items()}
+    currency = format_dict(users, table_listed=True, sort=True, num_columns=2)
+    betting_pool = format_dict(
+        betting_pool, table_listed=True, sort=True, num_columns=2
+    )
+    bets = format_dict(bets, table_bet_listed=True)
+    return f":coin: Current fluxbux listing\n{currency}\n:moneybag: Betting pool\n{betting_pool}\n:bar_chart: Bets for week {week}\n{bets}"
+
+
+def settle_week(users: dict, week: dict, roll: str, names: dict, winner_id: int):
+    # Returns the change to each balance, the outcomes, the week result and
+    # the payout message
+    balances = dict(users)
+    betting_pool = sum(week["betting_pool"].values())
+    winner_pool = week["betting_pool"].get(roll)
+    if HOUSE_ID not in balances:
+        balances[HOUSE_ID] = 0
+    total_house_comission = 0
+    total_house_loss = 0
+    total_house_gain = 0
+    tax_pool = 0
+    taxed = []
+    incorrect_bets = 0
+    correct_bets = 0
+    counter = 0
+    outcomes = {}
+    for user in balances:
+        if user == HOUSE_ID:
+            continue
+        if user not in week["bets"]:
+            tax = round(balances[user] * 0.3)
+            tax_pool += tax
+            balances[user] -= tax
+            taxed.append(user)
+            outcomes[counter] = {
+                "user": user,
+                "outcome": "taxed",
+                "balance": tax,
+            }
+        counter += 1
+
+    for user, bets in week["bets"].items():
+        total_bets = sum(bets.values())
+        threshhold = 0.1 * balances[user]
+        if total_bets <= threshhold:
+            difference = round(threshhold - total_bets)
+            tax = difference
+            tax_pool += tax
+            balances[user] -= tax
+            taxed.append(user)
+            outcomes[counter] = {
+                "user": user,
+                "outcome": "taxed",
+                "balance": tax,
+            }
+            counter += 1
+
+        for bet_on, points in bets.items():
+            if bet_on == roll:
+                ratio = payout_ratio(week["options"])
+                payout = round(points * ratio)
+                house_com = round(payout * 0.05)
+                payout -= house_com  # house comission
+                total_house_comission += house_com
+                total_house_loss += payout
+                balances[user] += payout
+                correct_bets += 1
+                outcomes[counter] = {
+                    "user": user,
+                    "outcome": "won",
+                    "balance": payout,
+                }
+            elif bet_on != roll:
+                total_house_gain += points
+                balances[user] -= points
+                incorrect_bets += 1
+                outcomes[counter] = {
+                    "user": user,
+                    "outcome": "lost",
+                    "balance": points,
+                }
+            counter += 1
+
+    if taxed != []:
+        bets = list(week["bets"].keys())
+        # filter out taxed users
+        bets = [user for user in bets if user not in taxed]
+        cut = round(tax_pool / len(bets))
+        for user in bets:
+            balances[user] += cut
+            outcomes[counter] = {
+                "user": user,
+                "outcome": "tax return",
+                "balance": cut,
+            }
+            counter += 1
+
+    balances[HOUSE_ID] += total_house_gain - total_house_loss
+
+    winning_string = ""
+    losing_string = ""
+    taxed_string = ""
+    tax_return_string = ""
+    labels = user_labels(balances, names)
+    for data in outcomes.values():
+        data = {**data, "user": labels[data["user"]]}
+        if data["outcome"] == "won":
+            winning_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
+        elif data["outcome"] == "lost":
+            losing_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
+        elif data["outcome"] == "taxed":
+            taxed_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
+        elif data["outcome"] == "tax return":
+            tax_return_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
+
+    winner = roll if winner_id is None else f"<@{winner_id}>"
+    return_string = f"The winner is {winner}\n**Gain:**\n{winning_string}**Loss**\n{losing_string}**Taxed:**\n{taxed_string}**Tax return:**\n{tax_return_string}"
+    result = {
+        ":tada: Winner": roll,
+        ":white_check_mark: Correct bets": correct_bets,
+        "<:redCross:1126317725497692221> Incorrect bets": incorrect_bets,
+        ":moneybag: Total betting pool": betting_pool,
+        ":moneybag: Winning pool": winner_pool,
+        ":moneybag: Total payouts": total_house_loss,
+        ":moneybag: Taxes": tax_pool,
+        ":moneybag: Taxed players": len(taxed),
+        ":house: Total house comission on payouts": total_house_comission,
+        ":house: Total fluxbux to house from lost bets": total_house_gain,
+        ":house: Total fluxbux gone to the house": total_house_gain
+        - total_house_loss,
+    }
+    deltas = {
+        user: balance - users.get(user, 0)
+        for user, balance in balances.items()
+        if user not in users or balance != users[user]
+    }
+    return deltas, list(outcomes.values()), result, return_string
+
+
+def timed_call(func, *args):
+    # Time spent in the worker itself, without the hand-off
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def call_in_module(module_name: str, path: str, func_name: str, *args):
+    # Runs in a worker. Code loaded by /reload can't be imported by its
+    # name, the worker loads it from the file the first time it's needed.
+    module = sys.modules.get(module_name)
+    if module is None:
+        if path is None:
+            module = importlib.import_module(module_name)
+        else:
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            sys.modules[module_name] = module
+    return timed_call(getattr(module, func_name), *args)
 
-                # Save a backup, this is not ran if the first save fails
-                async with aiofiles.open(
-                    f"backup/database_{formatted_date}.json", "w", encoding="utf-8"
-                ) as f:
-                    await f.write(json.dumps(await to_json.game.to_json(), indent=4))
 
-                await asyncio.sleep(PROCESS_WAIT_TIME)
-            except Exception:
-                traceback.print_exc()
+class ComputeDispatcher:
+    # Work is timed per kind and item, anything estimated to take longer
+    # than the inline budget goes to the pool so the loop keeps serving
+    # autocomplete and the small commands in the meantime. /reload hands
+    # the dispatcher and its pool to the new code.
+    ALPHA = 0.2
+
+    def __init__(
+        self,
+        pool: str = COMPUTE_POOL,
+        workers: int = COMPUTE_WORKERS,
+        budget: float = COMPUTE_INLINE_BUDGET,
+    ):
+        self.pool_kind = pool
+        self.workers = workers
+        self.budget = budget
+        self.pool = None
+        self.cost = {}  # kind -> smoothed seconds per item
+        self.inline = {}  # kind -> runs on the loop
+        self.offloaded = {}  # kind -> runs in the pool
+        # From the module the workers can import, reloaded code is sent
+        # through it by name
+        self.call_in_module = call_in_module
+
+    def size_threshold(self, kind: str) -> float:
+        if not self.cost.get(kind):
+            # Unmeasured work goes to the pool, a big first payout would
+            # otherwise block the loop before a defer could go out
+            return 0
+        return self.budget / self.cost[kind]
+
+    def get_pool(self):
+        if self.pool is None:
+            if (
+                self.pool_kind == "process"
+                and "forkserver" in multiprocessing.get_all_start_methods()
+            ):
+                # Workers are forked from a clean server process, forking the
+                # bot itself would copy locks held by its threads
+                self.pool = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("forkserver")
+                )
+            else:
+                self.pool = concurrent.futures.ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="compute"
+                )
+        return self.pool
+
+    def observe(self, kind: str, size: int, elapsed: float):
+        per_item = elapsed / max(size, 1)
+        if kind not in self.cost:
+            self.cost[kind] = per_item
+        else:
+            self.cost[kind] += self.ALPHA * (per_item - self.cost[kind])
+
+    async def run(self, kind: str, size: int, func, *args):
+        start = time.perf_counter()
+        if self.pool_kind == "inline" or size < self.size_threshold(kind):
+            result = func(*args)
+            self.inline[kind] = self.inline.get(kind, 0) + 1
+            self.observe(kind, size, time.perf_counter() - start)
+            return result
+        pool = self.get_pool()
+        if isinstance(pool, concurrent.futures.ProcessPoolExecutor):
+            path = None
+            if func.__module__.startswith("fluxbuxer_reload_"):
+                path = func.__globals__["__file__"]
+            call = (self.call_in_module, func.__module__, path, func.__name__, *args)
+        else:
+            call = (timed_call, func, *args)
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(
+                pool, *call
+            )
+        except concurrent.futures.BrokenExecutor:
+            log.exception("Compute pool broke, running %s inline", kind)
+            self.pool = None
+            return func(*args)
+        self.offloaded[kind] = self.offloaded.get(kind, 0) + 1
+        self.observe(kind, size, elapsed)
+        return result
+
+    def start(self):
+        # Bring the workers up front instead of on the first big render
+        if self.pool_kind != "inline":
+            list(self.get_pool().map(abs, range(self.workers)))
+
+    def shutdown(self):
+        if self.pool is not None:
+            # Whatever is queued still finishes, commands are waiting on it
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+
+# /reload passes the running dispatcher in, the pool outlives the code
+compute = globals().get("compute") or ComputeDispatcher()
+
+
+def int_keys(dictionary: dict, name_keys=frozenset()) -> dict:
+    # JSON object keys are strings, every key that wasn't saved as a name is
+    # a Discord ID
+    return {
+        int(key)
+        if isinstance(key, str) and key not in name_keys and key.isdecimal()
+        else key: value
+        for key, value in dictionary.items()
+    }
+
+
+def rekey(dictionary: dict, mapping: dict, merge) -> dict:
+    rekeyed = {}
+    for key, value in dictionary.items():
+        key = mapping.get(key, key)
+        rekeyed[key] = merge(rekeyed[key], value) if key in rekeyed else value
+    return rekeyed
+
+
+def merge_bets(bets: dict, other: dict) -> dict:
+    return {
+        option: bets.get(option, 0) + other.get(option, 0)
+        for option in [*bets, *(option for option in other if option not in bets)]
+    }
 
 
 class Game:
-    def __init__(self, users=None, user_map=None, weeks=None):
+    # Weeks of earlier years stay writable for this many weeks into a new
+    # year so the last payout and giveaway of the year can still happen
+    COLD_GRACE_WEEKS = 2
+
+    def __init__(
+        self,
+        users=None,
+        user_map=None,
+        weeks=None,
+        cold_weeks=None,
+        week_aliases=None,
+        change_seq=0,
+        balance_history=None,
+        boards=None,
+        names=None,
+        name_keys=None,
+    ):
         self.users = (
             users if users is not None else {}
-        )  # Dictionary to store users and their points
+        )  # Discord user ID -> points
         self.user_map = (
             user_map if user_map is not None else {}
         )  # Dictionary to store users and their points
         self.weeks = (
             weeks if weeks is not None else {}
         )  # Dictionary to store weeks and bets
-        self.current_week = str(date.today().isocalendar().week)
+        self.cold_weeks = (
+            cold_weeks if cold_weeks is not None else {}
+        )  # Closed years, year -> weeks of that year
+        self.week_aliases = (
+            week_aliases if week_aliases is not None else {}
+        )  # Old week numbers -> year-week keys, old giveaway buttons use them
+        self.feed = ChangeFeed(change_seq)  # Mutations for the change export
+        self.cold_saved = set()  # Cold years that have their own file
+        self.settling = set()  # Weeks with a payout being computed
+        self.boards = (
+            boards if boards is not None else {}
+        )  # Live status messages, week -> [channel id, message id]
+        self.history = BalanceHistory(balance_history)  # Balances over time
+        self.feed.listeners.append(self.record_balances)
+        self.names = {}  # Discord user ID -> display name, interned
+        self.ids = {}  # Lowercased display name -> Discord user IDs with it
+        self.name_keys = set(name_keys or ())  # Players still saved by name
+        if names is not None:
+            self.restore_user_ids()
+        for user_id, name in int_keys(names or {}).items():
+            self.set_name(user_id, name)
+        self.set_name(HOUSE_ID, "house")
+        self.current_week = week_key()
+        self.migrate_week_keys()
+        self.migrate_user_keys()
+        self.week_index = sorted(
+            [*self.weeks, *(week for year in self.cold_weeks.values() for week in year)]
+        )  # Every week key in time order
+
+    def migrate_week_keys(self):
+        legacy = [week for week in self.weeks if week.isdigit()]
+        if not legacy:
+            return
+        mapping = infer_week_years(legacy)
+        self.weeks = {mapping.get(week, week): data for week, data in self.weeks.items()}
+        self.week_aliases.update(mapping)
+
+    def all_week_data(self) -> list:
+        return [
+            *self.weeks.values(),
+            *(data for year in self.cold_weeks.values() for data in year.values()),
+        ]
+
+    def restore_user_ids(self):
+        self.users = int_keys(self.users, self.name_keys)
+        for data in self.all_week_data():
+            for field in ("bets", "claimed"):
+                if field in data:
+                    data[field] = int_keys(data[field], self.name_keys)
+        self.history.series = int_keys(self.history.series, self.name_keys)
+
+    def migrate_user_keys(self, members: dict = None) -> list:
+        # Players saved under their name before state was keyed by ID move
+        # to their Discord ID, merged with anything they have under it
+        # already. Names were usernames, so only usernames and operator links
+        # are trusted, nicknames can be set to anything. Returns the names
+        # nobody could be found for.
+        lookup = {name.lower(): user_id for name, user_id in (members or {}).items()}
+        lookup.update({name.lower(): user_id for name, user_id in self.user_map.items()})
+        lookup["house"] = HOUSE_ID
+        names = {user for user in self.users if isinstance(user, str)}
+        for data in self.all_week_data():
+            for field in ("bets", "claimed"):
+                names.update(user for user in data.get(field, {}) if isinstance(user, str))
+        names.update(user for user in self.history.series if isinstance(user, str))
+        mapping = {name: lookup[name.lower()] for name in names if name.lower() in lookup}
+        if mapping:
+            for name, user_id in mapping.items():
+                if user_id not in self.names:
+                    self.set_name(user_id, name)
+            self.users = rekey(self.users, mapping, lambda a, b: a + b)
+            for data in self.all_week_data():
+                if "bets" in data:
+                    data["bets"] = rekey(data["bets"], mapping, merge_bets)
+                if "claimed" in data:
+                    data["claimed"] = rekey(data["claimed"], mapping, lambda a, b: a or b)
+            self.history.series = rekey(self.history.series, mapping, lambda a, b: a)
+            # Cold years moved players too, their files are written again
+            self.cold_saved.clear()
+            game_log.info("Moved %s players from their names to Discord IDs", len(mapping))
+        self.name_keys = names - mapping.keys()
+        return sorted(self.name_keys)
+
+    def forget_name(self, user_id: int):
+        name = self.names.pop(user_id, None)
+        if name is not None:
+            owners = self.ids.get(name.lower(), set())
+            owners.discard(user_id)
+            if not owners:
+                self.ids.pop(name.lower(), None)
+
+    def set_name(self, user_id: int, name: str):
+        if self.names.get(user_id) == name:
+            return
+        self.forget_name(user_id)
+        # Every copy of a name points at the same string
+        name = sys.intern(name)
+        self.names[user_id] = name
+        self.ids.setdefault(name.lower(), set()).add(user_id)
+
+    def display_name(self, user_id: int) -> str:
+        return self.names.get(user_id, str(user_id))
+
+    def id_for_name(self, name: str) -> int:
+        # Links by an operator first, a display name only if it's unique
+        user_id = self.user_map.get(name, self.user_map.get(name.lower()))
+        if user_id is None:
+            owners = self.ids.get(name.lower(), ())
+            if len(owners) == 1:
+                user_id = next(iter(owners))
+        return user_id
+
+    def resolve_user(self, value: str) -> int:
+        # Autocomplete hands back the ID, typed names are looked up
+        if value.isdigit() and int(value) in self.users:
+            return int(value)
+        return self.id_for_name(value)
+
+    def week_data(self, week: str) -> dict:
+        if week in self.weeks:
+            return self.weeks[week]
+        if parse_week(week) != week:
+            return {}
+        return self.cold_weeks.get(str(week_year(week)), {}).get(week, {})
+
+    def resolve_week(self, week: str) -> str:
+        # The key for a typed week, None if it can't be one. A bare number is
+        # always this year, old week numbers only live on in button ids.
+        week = week.strip()
+        if week.isdecimal():
+            return parse_week(f"{week_year(self.current_week)}-W{week}")
+        return parse_week(week)
+
+    def weeks_between(self, start: str, end: str) -> list:
+        # Inclusive range of week keys, both ends can be any key
+        low = bisect.bisect_left(self.week_index, start)
+        high = bisect.bisect_right(self.week_index, end)
+        return self.week_index[low:high]
+
+    def recent_weeks(self, count: int) -> list:
+        return self.week_index[-count:] if count > 0 else []
+
+    async def close_cold_years(self, today: date = None):
+        iso = (today or date.today()).isocalendar()
+        for week in list(self.weeks):
+            year = week_year(week)
+            if year >= iso.year:
+                continue
+            if year == iso.year - 1 and iso.week <= self.COLD_GRACE_WEEKS:
+                continue
+            self.cold_weeks.setdefault(str(year), {})[week] = self.weeks.pop(week)
+            self.boards.pop(week, None)
 
     @classmethod
     def from_json(cls, json_str):
         data = json.loads(json_str)
         return cls(**data)
 
+    @classmethod
+    def from_snapshot(cls, raw: bytes, cold_dir: str = COLD_DIR):
+        data = decode_snapshot(raw)
+        cold = read_cold_years(cold_dir)
+        # Saves from before cold years had their own files still hold them
+        data["cold_weeks"] = {**cold, **data.get("cold_weeks", {})}
+        game = cls(**data)
+        game.cold_saved.update(cold)
+        return game
+
+    def unsaved_cold_years(self) -> dict:
+        return {
+            year: weeks
+            for year, weeks in self.cold_weeks.items()
+            if year not in self.cold_saved
+        }
+
     async def to_json(self):
         return {
             "users": self.users,
             "user_map": self.user_map,
             "weeks": self.weeks,
+            "cold_weeks": self.unsaved_cold_years(),
+            "week_aliases": self.week_aliases,
+            "change_seq": self.feed.seq,
+            "balance_history": self.history.to_json(),
+            "boards": self.boards,
+            "names": self.names,
+            "name_keys": sorted(self.name_keys),
         }
 
+    def record_balances(self, event: dict):
+        if event["kind"] not in BalanceHistory.BALANCE_EVENTS:
+            return
+        for user in (event.get("user"), event.get("target")):
+            if user in self.users:
+                self.history.record(user, self.users[user], event["time"])
+
     async def setup_week(self, week):
         if week not in self.weeks:
             self.weeks[week] = {}
+            if week not in self.week_index:
+                bisect.insort(self.week_index, week)
         if "options" not in self.weeks[week]:
             self.weeks[week]["options"] = []
         if "result" not in self.weeks[week]:
@@ -188,12 +1752,14 @@ class Game:
         if "claimed" not in self.weeks[week]:
             self.weeks[week]["claimed"] = {}
 
-    async def add_user(self, name: str):
-        if name not in self.users:
-            self.users[name] = 0
+    async def add_user(self, user: int):
+        if user not in self.users:
+            self.users[user] = 0
 
     async def link(self, user: str, discord_user: discord.User):
         self.user_map[user] = discord_user.id
+        # Whatever was saved under the nickname belongs to the linked account
+        self.migrate_user_keys()
 
     async def set_options(self, week: str, options: list, reset: str):
         if reset == "full":
@@ -204,20 +1770,26 @@ class Game:
         if reset == "options":
             self.weeks[week]["options"] = []
         self.weeks[week]["options"] += options
+        self.feed.emit("options_set", week=week, option=",".join(options))
         listed_users = "\n".join("- " + user for user in self.weeks[week]["options"])
-        return await print_return(f"Set week {week} to:\n{listed_users}")
+        return await log_return(f"Set week {week} to:\n{listed_users}")
 
     async def give_points(self, user, points, week, button=False):
         await self.add_user(user)
         if not button:
             self.users[user] += points
-            return await print_return(
-                f"Gave {points} fluxbux to {user}, they now have {self.users[user]} fluxbux"
+            self.feed.emit("give", week=week, user=user, points=points)
+            return await log_return(
+                f"Gave {points} fluxbux to {self.display_name(user)}, they now have {self.users[user]} fluxbux"
             )
         if button:
+            if week not in self.weeks:
+                # Closed off with its year
+                return False
             if not self.weeks.get(week).get("claimed").get(user, False):
                 self.weeks[week]["claimed"][user] = True
                 self.users[user] += points
+                self.feed.emit("claim", week=week, user=user, points=points)
                 return True
             return False
 
@@ -227,12 +1799,15 @@ class Game:
         if (await self.spent_points(week, from_user) + points) > self.users.get(
             from_user, 0
         ):
-            return f"{from_user} does not have enough fluxbux to transfer\nTransfering and running the bet might net you negative fluxbux."
+            return f"{self.display_name(from_user)} does not have enough fluxbux to transfer\nTransfering and running the bet might net you negative fluxbux."
         self.users[from_user] -= points
         self.users[to_user] += points
-        return f"Transferred {points} fluxbux. From {from_user}({self.users[from_user]}) to {to_user}({self.users[to_user]})."
+        self.feed.emit(
+            "transfer", week=week, user=from_user, target=to_user, points=points
+        )
+        return f"Transferred {points} fluxbux. From {self.display_name(from_user)}({self.users[from_user]}) to {self.display_name(to_user)}({self.users[to_user]})."
 
-    async def spent_points(self, week, user: str):
+    async def spent_points(self, week, user: int):
         try:
             total_usage = sum(self.weeks[week].get("bets").get(user).values())
         except Exception:
@@ -249,17 +1824,24 @@ class Game:
                     betting_pool[option] = value
         self.weeks[week]["betting_pool"] = betting_pool
 
-    async def remove_bet(self, week: str, user: str, bet_on: str):
+    async def remove_bet(self, week: str, user: int, bet_on: str):
+        if week in self.settling:
+            return f"Week {week} is being paid out"
         try:
-            del self.weeks[week]["bets"][user][bet_on]
+            points = self.weeks[week]["bets"][user].pop(bet_on)
             await self.update_pool(week)
+            self.feed.emit(
+                "bet_removed", week=week, user=user, option=bet_on, points=points
+            )
             return f"Removed your bet on {bet_on}"
         except Exception:
             return f"Failed to remove bet on {bet_on}"
 
-    async def place_bet(self, week: str, user: str, bet_on: str, points: int):
+    async def place_bet(self, week: str, user: int, bet_on: str, points: int):
         try:
             await self.add_user(user)
+            if week in self.settling:
+                return f"Week {week} is being paid out"
             # Check if this week has already finished
             if self.weeks.get(week).get("result") != {}:
                 return f"Week {week} has already been ran, you bet on {self.weeks.get(week).get('bets').get(user).get('bet_on')}"
@@ -280,7 +1862,7 @@ class Game:
                 if options % 2 == 1:
                     options += 1
                 if bets >= (options / 2):
-                    return f"{user} has made too many bets"
+                    return f"{self.display_name(user)} has made too many bets"
 
             # Add your user bet if it doesn't exist
             if user not in self.weeks.get(week).get("bets"):
@@ -293,180 +1875,125 @@ class Game:
 
             # Update betting pool
             await self.update_pool(week)
+            self.feed.emit("bet_placed", week=week, user=user, option=bet_on, points=points)
 
             ratio = await self.get_payout_ratio(week=week)
             total_bets = sum(self.weeks.get(week).get("bets").get(user).values())
             percentage = round((total_bets / self.users[user]) * 100, 2)
-            return_string = f"**{user}** bet **{points}** fluxbux on **{bet_on}** for a **{ratio}** payout ratio on week {week}.\nYour percentage so far is **{percentage}%** of your fluxbux. The threshold is **10%**."
+            return_string = f"**{self.display_name(user)}** bet **{points}** fluxbux on **{bet_on}** for a **{ratio}** payout ratio on week {week}.\nYour percentage so far is **{percentage}%** of your fluxbux. The threshold is **10%**."
             return return_string
         except Exception as e:
-            traceback.print_exc()
+            game_log.exception("Placing a bet failed")
             return e
 
     async def update_points(self, week: str, roll: str):
         try:
             if week not in self.weeks:
-                return await print_return("No game set up for this week")
+                return await log_return("No game set up for this week")
             betting_pool = sum(
                 self.weeks.get(week, {}).get("betting_pool", {}).values()
             )
-            winner_pool = self.weeks.get(week).get("betting_pool").get(roll)
             if betting_pool == 0:
                 return f"No bets have been made for week {week}"
-            if roll not in self.weeks.get(week).get("betting_pool"):
-                self.weeks[week]["betting_pool"][roll] = 0
-            if "house" not in self.users:
-                self.users["house"] = 0
-            total_house_comission = 0
-            total_house_loss = 0
-            total_house_gain = 0
-            tax_pool = 0
-            taxed = []
-            incorrect_bets = 0
-            correct_bets = 0
-            counter = 0
-            outcomes = {}
-            for user in self.users:
-                if user == "house":
-                    continue
-                if user not in self.weeks.get(week).get("bets"):
-                    tax = round(self.users[user] * 0.3)
-                    tax_pool += tax
-                    self.users[user] -= tax
-                    taxed.append(user)
-                    if user == "rickywl":
-                        print(tax)
-                    outcomes[counter] = {
-                        "user": user,
-                        "outcome": "taxed",
-                        "balance": tax,
-                    }
-                counter += 1
-
-            for user, bets in self.weeks.get(week).get("bets").items():
-                total_bets = sum(bets.values())
-                threshhold = 0.1 * self.users[user]
-                if total_bets <= threshhold:
-                    difference = round(threshhold - total_bets)
-                    tax = difference
-                    tax_pool += tax
-                    self.users[user] -= tax
-                    taxed.append(user)
-                    outcomes[counter] = {
-                        "user": user,
-                        "outcome": "taxed",
-                        "balance": tax,
-                    }
-                    counter += 1
-
-                for bet_on, points in bets.items():
-                    if bet_on == roll:
-                        ratio = await self.get_payout_ratio(week=week)
-                        payout = round(points * ratio)
-                        house_com = round(payout * 0.05)
-                        payout -= house_com  # house comission
-                        total_house_comission += house_com
-                        total_house_loss += payout
-                        self.users[user] += payout
-                        correct_bets += 1
-                        outcomes[counter] = {
-                            "user": user,
-                            "outcome": "won",
-                            "balance": payout,
-                        }
-                    elif bet_on != roll:
-                        total_house_gain += points
-                        self.users[user] -= points
-                        incorrect_bets += 1
-                        outcomes[counter] = {
-                            "user": user,
-                            "outcome": "lost",
-                            "balance": points,
-                        }
-                    counter += 1
-
-            if taxed != []:
-                bets = list(self.weeks.get(week).get("bets").keys())
-                # filter out taxed users
-                bets = [user for user in bets if user not in taxed]
-                cut = round(tax_pool / len(bets))
-                for user in bets:
-                    self.users[user] += cut
-                    outcomes[counter] = {
-                        "user": user,
-                        "outcome": "tax return",
-                        "balance": cut,
-                    }
-                    counter += 1
-
-            self.users["house"] += total_house_gain - total_house_loss
-
-            winning_string = ""
-            losing_string = ""
-            taxed_string = ""
-            tax_return_string = ""
-            for user, data in outcomes.items():
-                if data["outcome"] == "won":
-                    winning_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
-                elif data["outcome"] == "lost":
-                    losing_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
-                elif data["outcome"] == "taxed":
-                    taxed_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
-                elif data["outcome"] == "tax return":
-                    tax_return_string += f"- **{data['user']}** {data['outcome']} **{data['balance']}** fluxbux\n"
-
-            winner_id = self.user_map.get(roll.lower(), roll)
-            return_string = f"The winner is <@{winner_id}>\n**Gain:**\n{winning_string}**Loss**\n{losing_string}**Taxed:**\n{taxed_string}**Tax return:**\n{tax_return_string}"
-            self.weeks[week]["result"] = {
-                ":tada: Winner": roll,
-                ":white_check_mark: Correct bets": correct_bets,
-                "<:redCross:1126317725497692221> Incorrect bets": incorrect_bets,
-                ":moneybag: Total betting pool": betting_pool,
-                ":moneybag: Winning pool": winner_pool,
-                ":moneybag: Total payouts": total_house_loss,
-                ":moneybag: Taxes": tax_pool,
-                ":moneybag: Taxed players": len(taxed),
-                ":house: Total house comission on payouts": total_house_comission,
-                ":house: Total fluxbux to house from lost bets": total_house_gain,
-                ":house: Total fluxbux gone to the house": total_house_gain
-                - total_house_loss,
-            }
-            return await print_return(f"||{return_string}||")
+            if week in self.settling:
+                return f"Week {week} is already being paid out"
+
+            # Settle a copy, bets for the week are refused until it's applied
+            self.settling.add(week)
+            try:
+                data = self.weeks[week]
+                snapshot = {
+                    "options": list(data["options"]),
+                    "betting_pool": dict(data["betting_pool"]),
+                    "bets": {user: dict(bets) for user, bets in data["bets"].items()},
+                }
+                size = len(self.users) + sum(map(len, snapshot["bets"].values()))
+                deltas, outcomes, result, return_string = await compute.run(
+                    "settle",
+                    size,
+                    settle_week,
+                    dict(self.users),
+                    snapshot,
+                    roll,
+                    dict(self.names),
+                    self.id_for_name(roll),
+                )
+            finally:
+                self.settling.discard(week)
+
+            if roll not in data["betting_pool"]:
+                data["betting_pool"][roll] = 0
+            # Apply changes rather than balances, transfers during the
+            # settlement stay intact
+            for user, delta in deltas.items():
+                self.users[user] = self.users.get(user, 0) + delta
+            data["result"] = result
+            for outcome in outcomes:
+                self.feed.emit(
+                    "settlement",
+                    week=week,
+                    user=outcome["user"],
+                    outcome=outcome["outcome"],
+                    points=outcome["balance"],
+                )
+            self.feed.emit("week_settled", week=week, option=roll, points=betting_pool)
+            return await log_return(f"||{return_string}||")
         except Exception as e:
-            traceback.print_exc()
+            game_log.exception("Payout for week %s failed", week)
             return e
 
     async def get_payout_ratio(self, week: str) -> float:
-        winning_probability = 1 / len(self.weeks.get(week).get("options"))
-        ratio = (1 - winning_probability) / winning_probability
-        ratio = round(ratio, 2)
-        return ratio
+        return payout_ratio(self.weeks.get(week).get("options"))
 
     async def print_status(self, week: str) -> str:
-        currency: str = await string_dict(
-            self.users, table_listed=True, sort=True, num_columns=2
-        )
-        betting_pool: str = await string_dict(
-            self.weeks.get(week, {}).get("betting_pool", {}),
-            table_listed=True,
-            sort=True,
-            num_columns=2,
+        data = self.week_data(week)
+        bets = {user: dict(bets) for user, bets in data.get("bets", {}).items()}
+        return await compute.run(
+            "status",
+            len(self.users) + len(bets),
+            render_status,
+            dict(self.users),
+            dict(data.get("betting_pool", {})),
+            bets,
+            week,
+            dict(self.names),
         )
-        bets: str = await string_dict(
-            self.weeks.get(week, {}).get("bets", {}), table_bet_listed=True
-        )
-        return f":coin: Current fluxbux listing\n{currency}\n:moneybag: Betting pool\n{betting_pool}\n:bar_chart: Bets for week {week}\n{bets}"
 
     async def print_roll(self, week: str) -> str:
-        if week not in self.weeks:
-            return f"No spin for week {week}"
-        if self.weeks[week]["result"] == {}:
+        result = self.week_data(week).get("result", {})
+        if result == {}:
             return f"No spin for week {week}"
-        return f"The spin for week {week} is:\n{await string_dict(self.weeks[week]['result'], listed=True)}"
+        return f"The spin for week {week} is:\n{await string_dict(result, listed=True)}"
+
+    async def print_history(self, user: int, weeks: list) -> str:
+        lines = []
+        for week in reversed(weeks):
+            data = self.week_data(week)
+            winner = data.get("result", {}).get(":tada: Winner", "not spun")
+            bets = data.get("bets", {}).get(user, {})
+            placed = ", ".join(f"**{bet}** {value}" for bet, value in bets.items())
+            lines.append(f"- {week}, winner **{winner}**: {placed or 'no bets'}")
+        if not lines:
+            return "No weeks played yet"
+        return f"{len(lines)} weeks for {self.display_name(user)}:\n" + "\n".join(lines)
+
+    async def print_trend(self, user: int, period: str) -> str:
+        sparkline = self.history.sparkline(user, period)
+        if sparkline is None:
+            return f"No balance history for {self.display_name(user)} yet"
+        rollup = getattr(self.history.series[user], period)
+        closes = rollup.closes[-len(sparkline):]
+        unit = "days" if period == "daily" else "weeks"
+        return (
+            f"**{self.display_name(user)}** over the last {len(closes)} {unit}\n"
+            f"`{sparkline}`\n"
+            f"From **{closes[0]}** to **{closes[-1]}** fluxbux, "
+            f"low **{min(rollup.lows[-len(closes):])}**, high **{max(rollup.highs[-len(closes):])}**"
+        )
 
-    async def print_user_balance(self, user: str, week: str) -> str:
+    async def print_user_balance(self, user: int, week: str) -> str:
         if user not in self.users:
-            return f"{user} is not a user"
+            return f"{self.display_name(user)} is not a user"
         points = self.users[user]
         user_bets = self.weeks.get(week).get("bets").get(user)
         total_bets = sum(user_bets.values()) if user_bets else 0
@@ -478,65 +2005,334 @@ class Game:
         return f"You have **{points}** fluxbux and have bet **{percentage}%** of your fluxbux.\n{bets}"
 
 
+def load_fresh_module():
+    # Run this file again as a new module, the running one is left alone
+    name = f"fluxbuxer_reload_{time.monotonic_ns()}"
+    spec = importlib.util.spec_from_file_location(name, Path(__file__).resolve())
+    module = importlib.util.module_from_spec(spec)
+    # The new code keeps using the running bot and compute pool
+    module.bot = bot
+    module.compute = compute
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[name]
+        raise
+    return module
+
+
+class LeaderLock:
+    # An exclusive flock, the OS drops it when the holder dies however it dies
+    def __init__(self, path: str = LOCK_PATH):
+        if fcntl is None:
+            raise RuntimeError("Standby mode needs fcntl file locks")
+        self.path = path
+        self.file = None
+
+    def try_acquire(self) -> bool:
+        if self.file is None:
+            self.file = open(self.path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(str(os.getpid()))
+        self.file.flush()
+        return True
+
+    def release(self):
+        if self.file is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+
+class SnapshotFollower:
+    # Keeps a decoded copy of the leader's latest save
+    def __init__(self, path: str = DATABASE_PATH):
+        self.path = path
+        self.signature = None
+        self.game = None
+        self.loads = 0
+
+    async def poll(self) -> bool:
+        path = newest_database(self.path)
+        try:
+            stat = await aiofiles.os.stat(path)
+        except FileNotFoundError:
+            return False
+        signature = (path, stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return False
+        async with aiofiles.open(path, "rb") as f:
+            raw = await f.read()
+        self.game = await asyncio.to_thread(Game.from_snapshot, raw)
+        self.signature = signature
+        self.loads += 1
+        return True
+
+
+async def wait_for_leadership(
+    lock: LeaderLock,
+    follower: SnapshotFollower,
+    lock_interval: float = 0.5,
+    follow_interval: float = 2,
+):
+    log.info("Standing by for %s", lock.path)
+    last_follow = 0
+    while not lock.try_acquire():
+        if time.monotonic() - last_follow >= follow_interval:
+            last_follow = time.monotonic()
+            try:
+                if await follower.poll():
+                    log.debug("Standby loaded save %s", follower.loads)
+            except Exception:
+                log.exception("Standby couldn't load %s", follower.path)
+        await asyncio.sleep(lock_interval)
+    # The old leader is gone, pick up whatever it saved last
+    await follower.poll()
+    log.info("Took over as leader")
+    return follower.game
+
+
 class Commands(discord.Cog, name="Commands"):
     def __init__(self, bot, json_queue):
         self.game: Game = None
         self.bot: discord.Bot = bot
         self.json_queue = json_queue
-        self.current_week = str(date.today().isocalendar().week)
+        self.responder = AdaptiveResponder()
+        self.profiler = Profiler()
+        self.limiter = RateLimiter()
+        self.current_week = week_key()
+        self.update_task = None
+        self.export_task = None
+        self.status_board = None
+        self.views_registered = False
 
     @discord.Cog.listener()
     async def on_ready(self):
-        try:
-            with open("database.json", "r", encoding="utf-8") as f:
-                json_data = json.dumps(json.load(f))
-                self.game: Game = Game.from_json(json_data)
-                print("Loaded game")
-            assert isinstance(self.game, Game)
-        except Exception:
-            self.game: Game = Game()
-            print("Started a new game")
+        # on_ready fires again after a full reconnect, keep the game we have
+        if self.game is None:
+            try:
+                path = newest_database()
+                with open(path, "rb") as f:
+                    self.game: Game = Game.from_snapshot(f.read())
+                    log.info("Loaded game from %s", path)
+                assert isinstance(self.game, Game)
+            except Exception:
+                self.game: Game = Game()
+                log.exception("Couldn't load %s, started a new game", DATABASE_PATH)
+        self.refresh_names()
+        if not self.views_registered:
+            self.register_views()
+        self.start()
+
+    def refresh_names(self):
+        members = list(self.bot.get_all_members())
+        unresolved = self.game.migrate_user_keys(
+            {member.name: member.id for member in members}
+        )
+        if unresolved:
+            log.warning(
+                "No Discord user found for %s, their fluxbux stay under the name "
+                "until they're linked",
+                ", ".join(unresolved),
+            )
+        for member in members:
+            self.refresh_name(member)
 
-        # setup giveaway views
-        view = discord.ui.View(timeout=None)
+    def refresh_name(self, user: discord.abc.User):
+        # Only players are cached, anyone else is added when they first play
+        if self.game is not None and user.id in self.game.users:
+            self.game.set_name(user.id, user.display_name)
+
+    @discord.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.refresh_name(after)
+
+    @discord.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        self.refresh_name(after)
+
+    @discord.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self.refresh_name(member)
+
+    def register_views(self):
+        self.views_registered = True
+        # setup giveaway views, a view holds at most 25 buttons so use one each
         for week in self.game.weeks:
+            view = discord.ui.View(timeout=None)
             view.add_item(PointButton(self.game, week))
-        self.bot.add_view(view)
+            self.bot.add_view(view)
+        # buttons posted before weeks had a year still use the bare week number
+        for alias, week in self.game.week_aliases.items():
+            if week in self.game.weeks:
+                view = discord.ui.View(timeout=None)
+                view.add_item(PointButton(self.game, week, custom_id=alias))
+                self.bot.add_view(view)
+
+    def start(self):
+        if self.update_task is None or self.update_task.done():
+            log.info("Starting update loop")
+            self.update_task = asyncio.ensure_future(self.update_loop())
+        if self.export_task is None or self.export_task.done():
+            self.export_task = asyncio.ensure_future(
+                ChangeExporter(self.game.feed).run(5)
+            )
+        if self.status_board is None:
+            self.status_board = StatusBoard(self.bot, self.game)
+            self.status_board.start()
 
-        print("Starting update loop")
+    async def update_loop(self):
         while True:
-            self.current_week = str(date.today().isocalendar().week)
+            self.current_week = week_key()
             await self.game.setup_week(self.current_week)
+            await self.game.close_cold_years()
+            self.game.history.maintain()
             await self.json_queue.put(Jsonfy(self.game))
             await asyncio.sleep(15)
 
+    def cog_unload(self):
+        if self.update_task is not None:
+            self.update_task.cancel()
+        if self.export_task is not None:
+            self.export_task.cancel()
+        if self.status_board is not None:
+            self.status_board.stop()
+
+    def take_over(self, old):
+        # old is the Commands instance of the code being replaced, the game
+        # object is kept so anything holding on to it sees the same state.
+        # What it holds gets the new classes too, or their methods would
+        # stay the old code.
+        game = old.game
+        game.__class__ = Game
+        game.feed.__class__ = ChangeFeed
+        game.history.__class__ = BalanceHistory
+        for series in game.history.series.values():
+            series.__class__ = BalanceSeries
+            series.daily.__class__ = Rollup
+            series.weekly.__class__ = Rollup
+        # The old status board is stopped on unload, start() adds the new one
+        game.feed.listeners = [game.record_balances]
+        self.game = game
+        compute.__class__ = ComputeDispatcher
+        self.current_week = old.current_week
+        self.responder.latency.update(old.responder.latency)
+        self.responder.deviation.update(old.responder.deviation)
+        self.limiter.buckets = old.limiter.buckets
+        self.limiter.allowed = old.limiter.allowed
+        self.limiter.throttled = old.limiter.throttled
+        self.limiter.saved = old.limiter.saved
+        self.limiter.last_sweep = old.limiter.last_sweep
+
+    async def cog_before_invoke(self, ctx: discord.ApplicationContext):
+        # The command may make them a player and show their name
+        if self.game is not None:
+            self.game.set_name(ctx.user.id, ctx.user.display_name)
+
+    async def cog_after_invoke(self, ctx: discord.ApplicationContext):
+        if self.game is not None and ctx.user.id not in self.game.users:
+            self.game.forget_name(ctx.user.id)
+        if self.profiler.active and ctx.command.name != "profile":
+            self.profiler.command_done()
+
+    async def week_option(self, ctx: discord.ApplicationContext, week: str) -> str:
+        # The current week when left out, None once the user was told it's
+        # not a week
+        if week is None:
+            return self.current_week
+        key = self.game.resolve_week(week)
+        if key is None:
+            await ctx.respond(f"There's no week {week}", ephemeral=True)
+        return key
+
+    async def remembered(self, user_id: int, kind: str, key, coro):
+        # Keep the reply around to hand out when the user gets throttled
+        reply = await coro
+        self.limiter.remember(user_id, kind, reply, key)
+        return reply
+
+    def throttled_autocomplete(self, ctx: discord.AutocompleteContext, name: str):
+        # Suggestions are only reused for the same autocompleter and option
+        user_id = ctx.interaction.user.id
+        if self.limiter.acquire(user_id, "autocomplete"):
+            key = (name, ctx.focused.name)
+            return self.limiter.cached(user_id, "autocomplete", key) or []
+        return None
+
+    def autocomplete_reply(
+        self, ctx: discord.AutocompleteContext, name: str, reply: list
+    ) -> list:
+        self.limiter.remember(
+            ctx.interaction.user.id, "autocomplete", reply, (name, ctx.focused.name)
+        )
+        return reply
+
     async def bet_on_autocompleter(self, ctx: discord.AutocompleteContext):
         if self.game is None:
             await ctx.interaction.response.defer()
             return []
+        cached = self.throttled_autocomplete(ctx, "bet_on")
+        if cached is not None:
+            return cached
         users = self.game.weeks[self.current_week]["options"]
-        return [user for user in users if user.startswith(ctx.value.lower())][:25]
+        return self.autocomplete_reply(
+            ctx,
+            "bet_on",
+            [user for user in users if user.startswith(ctx.value.lower())][:25],
+        )
+
+    def user_choices(self, value: str) -> list:
+        # Shows the name, hands the ID to the command
+        value = value.lower()
+        choices = []
+        for user_id in self.game.users:
+            name = self.game.display_name(user_id)
+            if name.lower().startswith(value):
+                choices.append(discord.OptionChoice(name, value=str(user_id)))
+                if len(choices) == 25:
+                    break
+        return choices
 
     async def options_autocompleter(self, ctx: discord.AutocompleteContext):
         if self.game is None:
             await ctx.interaction.response.defer()
             return []
-        users = self.game.users.keys()
-        return [user for user in users if user.startswith(ctx.value.lower())][:25]
+        cached = self.throttled_autocomplete(ctx, "options")
+        if cached is not None:
+            return cached
+        return self.autocomplete_reply(ctx, "options", self.user_choices(ctx.value))
 
     async def player_autocompleter(self, ctx: discord.AutocompleteContext):
         if self.game is None:
             await ctx.interaction.response.defer()
             return []
-        users = self.game.users.keys()
-        return [user for user in users if user.startswith(ctx.value.lower())][:25]
+        cached = self.throttled_autocomplete(ctx, "player")
+        if cached is not None:
+            return cached
+        return self.autocomplete_reply(ctx, "player", self.user_choices(ctx.value))
 
     async def week_autocompleter(self, ctx: discord.AutocompleteContext):
         if self.game is None:
             await ctx.interaction.response.defer()
             return []
-        weeks = self.game.weeks.keys()
-        return [week for week in weeks if week.startswith(ctx.value.lower())][:25]
+        cached = self.throttled_autocomplete(ctx, "week")
+        if cached is not None:
+            return cached
+        value = ctx.value.upper()
+        matches = []
+        # newest first, typing just the week number matches it in any year
+        for week in reversed(self.game.week_index):
+            if week.startswith(value) or week.split("-W")[1].startswith(value):
+                matches.append(week)
+                if len(matches) == 25:
+                    break
+        return self.autocomplete_reply(ctx, "week", matches)
 
     @discord.slash_command(
         name="set",
@@ -558,10 +2354,10 @@ class Commands(discord.Cog, name="Commands"):
     )
     @discord.guild_only()
     async def set(self, ctx: discord.ApplicationContext, users: str, reset: str):
-        await ctx.defer()
         users = [option.strip() for option in users.split(sep=",")]
-        response = await self.game.set_options(self.current_week, users, reset)
-        await ctx.respond(response)
+        await self.responder.respond(
+            ctx, "set", self.game.set_options(self.current_week, users, reset)
+        )
 
     @discord.slash_command(
         name="give",
@@ -582,9 +2378,10 @@ class Commands(discord.Cog, name="Commands"):
     async def give(
         self, ctx: discord.ApplicationContext, user: discord.User, fluxbux: int
     ):
-        await ctx.defer()
-        response = await self.game.give_points(user.name, fluxbux, self.current_week)
-        await ctx.respond(response)
+        self.game.set_name(user.id, user.display_name)
+        await self.responder.respond(
+            ctx, "give", self.game.give_points(user.id, fluxbux, self.current_week)
+        )
 
     @discord.slash_command(
         name="status",
@@ -599,11 +2396,22 @@ class Commands(discord.Cog, name="Commands"):
     )
     @discord.guild_only()
     async def status(self, ctx: discord.ApplicationContext, week: str):
-        await ctx.defer()
+        week = await self.week_option(ctx, week)
         if week is None:
-            week = self.current_week
-        response = await self.game.print_status(week)
-        await ctx.respond(response)
+            return
+        retry_after = self.limiter.acquire(
+            ctx.user.id, "status", self.responder.latency.get("status", 0)
+        )
+        if retry_after:
+            cached = self.limiter.cached(ctx.user.id, "status", week)
+            note = f"Slow down, you can get a fresh status in {round(retry_after)}s"
+            await ctx.respond(f"{note}\n{cached}" if cached else note, ephemeral=True)
+            return
+        await self.responder.respond(
+            ctx,
+            "status",
+            self.remembered(ctx.user.id, "status", week, self.game.print_status(week)),
+        )
 
     @discord.slash_command(
         name="balance",
@@ -612,9 +2420,12 @@ class Commands(discord.Cog, name="Commands"):
     )
     @discord.guild_only()
     async def balance(self, ctx: discord.ApplicationContext):
-        await ctx.defer(ephemeral=True)
-        response = await self.game.print_user_balance(ctx.user.name, self.current_week)
-        await ctx.respond(response)
+        await self.responder.respond(
+            ctx,
+            "balance",
+            self.game.print_user_balance(ctx.user.id, self.current_week),
+            ephemeral=True,
+        )
 
     @discord.slash_command(
         name="results",
@@ -629,11 +2440,75 @@ class Commands(discord.Cog, name="Commands"):
     )
     @discord.guild_only()
     async def results(self, ctx: discord.ApplicationContext, week: str):
-        await ctx.defer()
+        week = await self.week_option(ctx, week)
         if week is None:
-            week = self.current_week
-        response = await self.game.print_roll(week)
-        await ctx.respond(response)
+            return
+        await self.responder.respond(ctx, "results", self.game.print_roll(week))
+
+    @discord.slash_command(
+        name="history",
+        description="Get your bets and the winners for the last weeks",
+        guild_ids=GUILDS,
+    )
+    @discord.option(
+        name="weeks",
+        description="How many weeks to show",
+        required=False,
+        default=5,
+    )
+    @discord.option(
+        name="since",
+        description="Show the weeks from this one on instead of the last ones",
+        required=False,
+        default=None,
+        autocomplete=week_autocompleter,
+    )
+    @discord.guild_only()
+    async def history(self, ctx: discord.ApplicationContext, weeks: int, since: str):
+        weeks = min(max(weeks, 1), 25)
+        if since is None:
+            shown = self.game.recent_weeks(weeks)
+        else:
+            since = await self.week_option(ctx, since)
+            if since is None:
+                return
+            shown = self.game.weeks_between(since, self.current_week)[:weeks]
+        await self.responder.respond(
+            ctx,
+            "history",
+            self.game.print_history(ctx.user.id, shown),
+            ephemeral=True,
+        )
+
+    @discord.slash_command(
+        name="trend",
+        description="Get a sparkline of a balance over time",
+        guild_ids=GUILDS,
+    )
+    @discord.option(
+        name="user",
+        description="Whose balance to show, yours by default",
+        required=False,
+        autocomplete=player_autocompleter,
+    )
+    @discord.option(
+        name="period",
+        description="Daily or weekly points",
+        choices=["daily", "weekly"],
+        required=False,
+        default="daily",
+    )
+    @discord.guild_only()
+    async def trend(self, ctx: discord.ApplicationContext, user: str, period: str):
+        user_id = ctx.user.id if user is None else self.game.resolve_user(user)
+        if user_id is None:
+            await ctx.respond(
+                f"No single user called {user}, pick them from the list", ephemeral=True
+            )
+            return
+        await self.responder.respond(
+            ctx, "trend", self.game.print_trend(user_id, period)
+        )
 
     @discord.slash_command(
         name="bet",
@@ -658,11 +2533,20 @@ class Commands(discord.Cog, name="Commands"):
         user: str,
         fluxbux: int,
     ):
-        await ctx.defer()
-        response = await self.game.place_bet(
-            self.current_week, ctx.user.name, user, fluxbux
+        retry_after = self.limiter.acquire(
+            ctx.user.id, "bet", self.responder.latency.get("bet", 0)
+        )
+        if retry_after:
+            await ctx.respond(
+                f"You're betting too fast, try again in {round(retry_after)}s",
+                ephemeral=True,
+            )
+            return
+        await self.responder.respond(
+            ctx,
+            "bet",
+            self.game.place_bet(self.current_week, ctx.user.id, user, fluxbux),
         )
-        await ctx.respond(response)
 
     @discord.slash_command(
         name="remove_bet",
@@ -681,9 +2565,21 @@ class Commands(discord.Cog, name="Commands"):
         ctx: discord.ApplicationContext,
         user: str,
     ):
-        await ctx.defer(ephemeral=True)
-        response = await self.game.remove_bet(self.current_week, ctx.user.name, user)
-        await ctx.respond(response)
+        retry_after = self.limiter.acquire(
+            ctx.user.id, "remove_bet", self.responder.latency.get("remove_bet", 0)
+        )
+        if retry_after:
+            await ctx.respond(
+                f"You're removing bets too fast, try again in {round(retry_after)}s",
+                ephemeral=True,
+            )
+            return
+        await self.responder.respond(
+            ctx,
+            "remove_bet",
+            self.game.remove_bet(self.current_week, ctx.user.id, user),
+            ephemeral=True,
+        )
 
     @discord.slash_command(
         name="payout",
@@ -699,9 +2595,39 @@ class Commands(discord.Cog, name="Commands"):
     )
     @discord.guild_only()
     async def payout(self, ctx: discord.ApplicationContext, winner: str):
-        await ctx.defer()
-        response = await self.game.update_points(self.current_week, winner)
-        await ctx.respond(response)
+        await self.responder.respond(
+            ctx, "payout", self.game.update_points(self.current_week, winner)
+        )
+
+    @discord.slash_command(
+        name="board",
+        description="Post a status message that keeps itself up to date",
+        guild_ids=GUILDS,
+        checks=[check_operator_roles()],
+    )
+    @discord.option(
+        name="week",
+        description="Which week the board is for",
+        required=False,
+        autocomplete=week_autocompleter,
+    )
+    @discord.guild_only()
+    async def board(self, ctx: discord.ApplicationContext, week: str):
+        week = await self.week_option(ctx, week)
+        if week is None:
+            return
+        # The render can be queued behind others, the responder defers in time
+        await self.responder.respond(
+            ctx, "board", self.post_board(ctx.channel, week), ephemeral=True
+        )
+
+    async def post_board(self, channel, week: str) -> str:
+        message = await channel.send(await self.game.print_status(week))
+        replaced = self.game.boards.get(week)
+        self.game.boards[week] = [message.channel.id, message.id]
+        if replaced:
+            return f"Posted the board for week {week}, the old one won't update anymore"
+        return f"Posted the board for week {week}"
 
     @discord.slash_command(
         name="giveaway",
@@ -717,9 +2643,12 @@ class Commands(discord.Cog, name="Commands"):
     )
     @discord.guild_only()
     async def giveaway(self, ctx: discord.ApplicationContext, week):
-        await ctx.defer()
+        week = await self.week_option(ctx, week)
         if week is None:
-            week = self.current_week
+            return
+        if week not in self.game.weeks:
+            await ctx.respond(f"Week {week} is closed or doesn't exist", ephemeral=True)
+            return
         if "claimed" not in self.game.weeks.get(week):
             self.game.weeks[week]["claimed"] = {}
         view = discord.ui.View(timeout=None)
@@ -752,11 +2681,17 @@ class Commands(discord.Cog, name="Commands"):
         user: str,
         fluxbux: int,
     ):
-        await ctx.defer()
-        response = await self.game.transfer_points(
-            ctx.user.name, user, fluxbux, self.current_week
+        user_id = self.game.resolve_user(user)
+        if user_id is None:
+            await ctx.respond(
+                f"No single user called {user}, pick them from the list", ephemeral=True
+            )
+            return
+        await self.responder.respond(
+            ctx,
+            "transfer",
+            self.game.transfer_points(ctx.user.id, user_id, fluxbux, self.current_week),
         )
-        await ctx.respond(response)
 
     @discord.slash_command(
         name="link",
@@ -777,10 +2712,110 @@ class Commands(discord.Cog, name="Commands"):
     async def link(
         self, ctx: discord.ApplicationContext, user: str, discord_user: discord.User
     ):
-        await ctx.defer()
         await self.game.link(user, discord_user)
         await ctx.respond(f"Linked {user} and {discord_user.name}")
 
+    @discord.slash_command(
+        name="profile",
+        description="Profile the bot for a while and report the hot spots",
+        guild_ids=GUILDS,
+        checks=[check_operator_roles()],
+    )
+    @discord.option(
+        name="mode",
+        description="Deterministic cProfile or a low overhead sampling profiler",
+        choices=["cprofile", "sampling"],
+        required=False,
+        default="cprofile",
+    )
+    @discord.option(
+        name="seconds",
+        description="How long to profile for, at most 600 seconds",
+        required=False,
+        default=60,
+    )
+    @discord.option(
+        name="commands",
+        description="Stop early after this many commands",
+        required=False,
+        default=None,
+    )
+    @discord.guild_only()
+    async def profile(
+        self, ctx: discord.ApplicationContext, mode: str, seconds: int, commands: int
+    ):
+        if self.profiler.active:
+            await ctx.respond("A profile is already running", ephemeral=True)
+            return
+        if mode == "sampling" and not hasattr(signal, "setitimer"):
+            await ctx.respond("Sampling isn't supported on this platform", ephemeral=True)
+            return
+        # Follow-ups stop working 15 minutes after the interaction
+        seconds = min(max(seconds, 1), 600)
+        await self.profiler.start(mode, seconds, commands)
+        until = f" or {commands} commands" if commands else ""
+        await ctx.respond(f"Profiling with {mode} for {seconds} seconds{until}", ephemeral=True)
+        await ctx.followup.send(await self.profiler.report(), ephemeral=True)
+
+    @discord.slash_command(
+        name="reload",
+        description="Reload the bot code without restarting, keeps the game",
+        guild_ids=GUILDS,
+        checks=[check_operator_roles()],
+    )
+    @discord.guild_only()
+    async def reload(self, ctx: discord.ApplicationContext):
+        if self.profiler.active:
+            await ctx.respond("Wait for the running profile to finish", ephemeral=True)
+            return
+        start = time.perf_counter()
+        try:
+            module = load_fresh_module()
+        except Exception as e:
+            commands_log.exception("Reloading failed")
+            await ctx.respond(f"New code failed to load, nothing changed: {e}", ephemeral=True)
+            return
+        schema = getattr(module, "STATE_SCHEMA_VERSION", None)
+        if schema != STATE_SCHEMA_VERSION:
+            await ctx.respond(
+                f"New code expects state schema {schema}, running {STATE_SCHEMA_VERSION}. "
+                "Restart the bot instead.",
+                ephemeral=True,
+            )
+            return
+
+        new_cog = module.Commands(self.bot, self.json_queue)
+        new_cog.take_over(self)
+        # No awaits between removing and adding, no command sees a gap
+        self.bot.remove_cog(self.qualified_name)
+        self.bot.add_cog(new_cog)
+        new_cog.register_views()
+        new_cog.start()
+        # Nothing refers to the code of an earlier reload anymore
+        if type(self).__module__.startswith("fluxbuxer_reload_"):
+            sys.modules.pop(type(self).__module__, None)
+        elapsed = round((time.perf_counter() - start) * 1000, 1)
+        commands_log.info("Reloaded commands in %sms", elapsed)
+        await ctx.respond(f"Reloaded in {elapsed}ms", ephemeral=True)
+        # Commands are found by name until the sync gives them their ids again
+        await self.bot.sync_commands()
+
+    @discord.slash_command(
+        name="limits",
+        description="Show how often the rate limits kicked in",
+        guild_ids=GUILDS,
+        checks=[check_operator_roles()],
+    )
+    @discord.guild_only()
+    async def limits(self, ctx: discord.ApplicationContext):
+        rows = {
+            kind: f"{stats['allowed']} allowed, {stats['throttled']} throttled, "
+            f"~{stats['saved_ms']}ms saved"
+            for kind, stats in self.limiter.stats().items()
+        }
+        rows["buckets"] = len(self.limiter.buckets)
+        await ctx.respond(await string_dict(rows, listed=True), ephemeral=True)
+
     # make a help command
     @discord.slash_command(
         name="help",
@@ -795,8 +2830,6 @@ class Commands(discord.Cog, name="Commands"):
         required=True,
     )
     async def help(self, ctx: discord.ApplicationContext, submenu: str):
-        await ctx.defer(ephemeral=True)
-
         if submenu == "commands":
             embed = discord.Embed(
                 title="Fluxbux Commands",
@@ -833,6 +2866,16 @@ class Commands(discord.Cog, name="Commands"):
                 value="Get the results of the current week or given week",
                 inline=False,
             )
+            embed.add_field(
+                name="history",
+                value="Get your bets and the winners for the last weeks or from a given week",
+                inline=False,
+            )
+            embed.add_field(
+                name="trend",
+                value="Get a sparkline of your balance or someone else's",
+                inline=False,
+            )
             embed.add_field(
                 name="help",
                 value="Get a list of commands, this command",
@@ -849,6 +2892,11 @@ class Commands(discord.Cog, name="Commands"):
                 value="Set the current week",
                 inline=False,
             )
+            embed.add_field(
+                name="board",
+                value="Post a status message that keeps itself up to date",
+                inline=False,
+            )
             embed.add_field(
                 name="giveaway",
                 value="Make a message which gives away fluxbux for 24 hours",
@@ -869,6 +2917,21 @@ class Commands(discord.Cog, name="Commands"):
                 value="Link a user to a discord user",
                 inline=False,
             )
+            embed.add_field(
+                name="profile",
+                value="Profile the bot and report the hot spots",
+                inline=False,
+            )
+            embed.add_field(
+                name="limits",
+                value="Show how often the rate limits kicked in",
+                inline=False,
+            )
+            embed.add_field(
+                name="reload",
+                value="Reload the bot code without restarting",
+                inline=False,
+            )
         if submenu == "betting":
             embed = discord.Embed(
                 title="Bet Command",
@@ -904,22 +2967,23 @@ class Commands(discord.Cog, name="Commands"):
                 inline=False,
             )
 
-        await ctx.respond(embed=embed)
+        await ctx.respond(embed=embed, ephemeral=True)
 
 
 class PointButton(discord.ui.Button):
-    def __init__(self, game, week):
+    def __init__(self, game, week, custom_id=None):
         super().__init__(
             label="Get Fluxbux",
             style=discord.ButtonStyle.primary,
-            custom_id=week,
+            custom_id=custom_id or week,
         )
         self.game = game
+        self.week = week
 
     async def callback(self, interaction: discord.Interaction):
         user: discord.User = interaction.user
         game: Game = self.game
-        week = str(self.custom_id)
+        week = self.week
         time_diff = datetime.now(timezone.utc) - interaction.message.created_at
         duration = timedelta(hours=24)
 
@@ -929,8 +2993,9 @@ class PointButton(discord.ui.Button):
             )
             return
 
+        game.set_name(user.id, user.display_name)
         gave_points = await game.give_points(
-            user=user.name, points=100, week=week, button=True
+            user=user.id, points=100, week=week, button=True
         )
         if gave_points:
             await interaction.response.send_message(
@@ -945,12 +3010,15 @@ class PointButton(discord.ui.Button):
 activity = discord.Activity(
     type=discord.ActivityType.playing, name="Let the fluxbux rain"
 )
-bot = discord.Bot(intents=discord.Intents.all(), command_prefix="!", activity=activity)
+# /reload passes the running bot in, it stays logged in
+bot = globals().get("bot") or discord.Bot(
+    intents=discord.Intents.all(), command_prefix="!", activity=activity
+)
 
 
 @bot.event
 async def on_ready():
-    print(f"We have logged in as {bot.user}")
+    log.info("We have logged in as %s", bot.user)
 
 
 @bot.event
@@ -964,20 +3032,46 @@ async def on_application_command_error(
 
 
 async def main():
+    game = None
+    lock = None
+    if STANDBY:
+        # Log in while waiting so taking over only needs the gateway connect
+        await bot.login(os.getenv("DISCORD_TOKEN"))
+        # Keep a reference, closing the file would drop the lock
+        lock = LeaderLock()
+        game = await wait_for_leadership(lock, SnapshotFollower())
+    elif fcntl is not None:
+        # Hold the lock too, a standby next to us must not take over
+        lock = LeaderLock()
+        if not lock.try_acquire():
+            raise RuntimeError(f"{LOCK_PATH} is held, another bot is already serving")
+    else:
+        log.warning("No file locks on this platform, not guarding against a second bot")
     json_queue = asyncio.Queue()
     asyncio.ensure_future(Jsonfy.process_json_queue(json_queue, 5, 1))
-    bot.add_cog(Commands(bot, json_queue))
-    await bot.start(os.getenv("DISCORD_TOKEN"))
+    commands = Commands(bot, json_queue)
+    commands.game = game
+    bot.add_cog(commands)
+    try:
+        if STANDBY:
+            await bot.connect()
+        else:
+            await bot.start(os.getenv("DISCORD_TOKEN"))
+    finally:
+        compute.shutdown()
+        if lock is not None:
+            lock.release()
 
 
 def init():
+    compute.start()
+    setup_logging()
     try:
         asyncio.get_event_loop().run_until_complete(main())
     except KeyboardInterrupt:
-        print("Caught keyboard interrupt")
-    except Exception as e:
-        traceback.print_exc()
-        print(str(e))
+        log.info("Caught keyboard interrupt")
+    except Exception:
+        log.exception("Bot stopped")
     sys.exit(0)
 
 
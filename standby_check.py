@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import tempfile
+import subprocess
+
+os.environ.setdefault("GUILDS", "0")
+os.environ.setdefault("OPERATOR_ID", "0")
+
+import main  # noqa: E402
+
+# Runs two processes through the same leader election and snapshot following
+# the bot uses in STANDBY mode, with a stand-in for the Discord connection.
+# The leader is killed with SIGKILL and the time until the standby serves is
+# measured.
+
+TICKS = 1  # The user ID ticks are counted under
+
+
+async def node(name: str):
+    lock = main.LeaderLock()
+    game = await main.wait_for_leadership(lock, main.SnapshotFollower(), 0.1, 0.2)
+    if game is None:
+        game = main.Game()
+    await game.add_user(TICKS)
+    print(f"LEADER {name} {game.users[TICKS]}", flush=True)
+
+    json_queue = asyncio.Queue()
+    asyncio.ensure_future(main.Jsonfy.process_json_queue(json_queue, 0.1, 0.05))
+    # Stands in for serving commands, every tick is a change that gets saved
+    while True:
+        game.users[TICKS] += 1
+        await json_queue.put(main.Jsonfy(game))
+        print(f"TICK {name} {game.users[TICKS]}", flush=True)
+        await asyncio.sleep(0.1)
+
+
+def start_node(name: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "node", name],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def wait_for(process: subprocess.Popen, prefix: str, timeout: float) -> list:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if line.startswith(prefix):
+            return line.split()
+        if not line and process.poll() is not None:
+            break
+    raise TimeoutError(f"No {prefix!r} from node")
+
+
+def check() -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        leader = start_node("a")
+        standby = None
+        try:
+            wait_for(leader, "LEADER", 10)
+            standby = start_node("b")
+            # Let the standby follow a few saves
+            for _ in range(20):
+                last_tick = int(wait_for(leader, "TICK", 5)[2])
+            leader.send_signal(signal.SIGKILL)
+            killed_at = time.monotonic()
+            leader.wait()
+
+            resumed_tick = int(wait_for(standby, "LEADER", 30)[2])
+            takeover = time.monotonic() - killed_at
+        finally:
+            for process in (leader, standby):
+                if process is not None and process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+    print(f"standby took over {round(takeover, 2)}s after the leader was killed")
+    print(
+        f"leader reached tick {last_tick}, standby resumed from {resumed_tick}, "
+        f"{last_tick - resumed_tick} ticks weren't saved yet"
+    )
+    if resumed_tick == 0:
+        print("FAIL: standby didn't pick up the leader's saves")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "node":
+        asyncio.run(node(sys.argv[2]))
+    else:
+        sys.exit(check())